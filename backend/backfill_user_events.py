@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+One-off backfill of the user_events activity log from existing orders,
+payments, support tickets and referrals. Safe to re-run: events that are
+already in the log are skipped.
+
+Usage (from the backend directory, with the usual .env):
+    python backfill_user_events.py
+"""
+
+import asyncio
+
+from beanie import init_beanie
+
+from server import DOCUMENT_MODELS, backfill_user_events, client, db_name
+
+
+async def main():
+    await init_beanie(database=client[db_name], document_models=DOCUMENT_MODELS)
+    counts = await backfill_user_events()
+    for source, count in counts.items():
+        print(f"{source}: {count} events")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,26 +1,60 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-from beanie import Document, init_beanie, Indexed, PydanticObjectId
+from beanie import Document, init_beanie, Indexed, PydanticObjectId, UpdateResponse
+from beanie.operators import AddToSet, In, Inc, Set
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Callable, Awaitable, Iterable, AsyncGenerator
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
+from pymongo import monitoring, CursorType, IndexModel, ReturnDocument, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
 import jwt
 import os
+import asyncio
 import logging
+import base64
 import hashlib
+import heapq
+import json
 import random
+import time
+import uuid
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import MappingProxyType
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Per-request MongoDB command counting (debug aid, exposed as X-DB-Query-Count)
+DB_QUERY_COUNT_HEADER = os.environ.get('DB_QUERY_COUNT_HEADER', 'false').lower() in ('1', 'true', 'yes')
+_request_db_queries: ContextVar[Optional[List[int]]] = ContextVar('request_db_queries', default=None)
+
+class QueryCountListener(monitoring.CommandListener):
+    def started(self, event):
+        counter = _request_db_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    event_listeners=[QueryCountListener()] if DB_QUERY_COUNT_HEADER else []
+)
 db_name = os.environ['DB_NAME']
 
 # JWT Config
@@ -28,9 +62,62 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'change-this-secret-key')
 JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
 JWT_EXPIRATION = int(os.environ.get('JWT_EXPIRATION_MINUTES', 1440))
 
+# Token version table refresh interval (picks up revocations from other workers)
+TOKEN_VERSION_REFRESH_SECONDS = float(os.environ.get('TOKEN_VERSION_REFRESH_SECONDS', 30))
+
+# Package catalog refresh interval (picks up package edits made on other workers)
+PACKAGE_CATALOG_REFRESH_SECONDS = float(os.environ.get('PACKAGE_CATALOG_REFRESH_SECONDS', 60))
+
+# Payment simulation timers
+PAYMENT_AUTO_SUCCESS_SECONDS = int(os.environ.get('PAYMENT_AUTO_SUCCESS_SECONDS', 180))
+PAYMENT_TIMEOUT_SECONDS = int(os.environ.get('PAYMENT_TIMEOUT_SECONDS', 900))
+PAYMENT_SCHEDULER_INTERVAL_SECONDS = float(os.environ.get('PAYMENT_SCHEDULER_INTERVAL_SECONDS', 5))
+PAYMENT_SCHEDULER_BATCH_SIZE = int(os.environ.get('PAYMENT_SCHEDULER_BATCH_SIZE', 500))
+
+# Server-sent event streams
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+STREAM_TOKEN_TTL_SECONDS = int(os.environ.get('STREAM_TOKEN_TTL_SECONDS', 60))
+PAYMENT_EVENTS_RECHECK_SECONDS = float(os.environ.get('PAYMENT_EVENTS_RECHECK_SECONDS', 60))
+
+# Unread notification counters
+BROADCAST_INDEX_REFRESH_SECONDS = int(os.environ.get('BROADCAST_INDEX_REFRESH_SECONDS', 30))
+UNREAD_RECONCILE_INTERVAL_SECONDS = int(os.environ.get('UNREAD_RECONCILE_INTERVAL_SECONDS', 3600))
+UNREAD_RECONCILE_BATCH_SIZE = int(os.environ.get('UNREAD_RECONCILE_BATCH_SIZE', 1000))
+
+# Notification retention: read ones expire via TTL, old unread ones are archived
+NOTIFICATION_READ_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_READ_RETENTION_DAYS', 30))
+NOTIFICATION_ARCHIVE_AFTER_DAYS = int(os.environ.get('NOTIFICATION_ARCHIVE_AFTER_DAYS', 90))
+BROADCAST_RETENTION_DAYS = int(os.environ.get('BROADCAST_RETENTION_DAYS', 365))
+NOTIFICATION_COMPACTION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_COMPACTION_BATCH_SIZE', 1000))
+NOTIFICATION_COMPACTION_INTERVAL_SECONDS = int(os.environ.get('NOTIFICATION_COMPACTION_INTERVAL_SECONDS', 3600))
+
+# Global business counters behind the admin dashboards
+METRICS_RECONCILE_INTERVAL_SECONDS = int(os.environ.get('METRICS_RECONCILE_INTERVAL_SECONDS', 3600))
+
+# Broadcast notification jobs
+BROADCAST_CHUNK_SIZE = int(os.environ.get('BROADCAST_CHUNK_SIZE', 1000))
+BROADCAST_JOB_POLL_SECONDS = float(os.environ.get('BROADCAST_JOB_POLL_SECONDS', 2))
+BROADCAST_JOB_LEASE_SECONDS = int(os.environ.get('BROADCAST_JOB_LEASE_SECONDS', 60))
+
+# Event broker: "memory" for a single worker, "mongo" to share events across workers
+BROKER_BACKEND = os.environ.get('BROKER_BACKEND', 'memory').lower()
+BROKER_COLLECTION = os.environ.get('BROKER_COLLECTION', 'broker_events')
+BROKER_CAPPED_SIZE_BYTES = int(os.environ.get('BROKER_CAPPED_SIZE_BYTES', 16 * 1024 * 1024))
+
+# List endpoint pagination
+PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', 50))
+PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 200))
+
+# Auth cache config
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get('AUTH_CACHE_TTL_SECONDS', 60))
+AUTH_CACHE_MAX_SIZE = int(os.environ.get('AUTH_CACHE_MAX_SIZE', 10000))
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 64))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -43,6 +130,7 @@ class User(Document):
     email: Indexed(EmailStr, unique=True)
     password_hash: str
     role: str = "user"  # user or admin
+    token_version: int = 0  # bumped to revoke previously issued tokens
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     settings: Dict[str, Any] = Field(default_factory=lambda: {"theme": "light", "color": "blue"})
     
@@ -50,6 +138,9 @@ class User(Document):
     
     class Settings:
         name = "users"
+        indexes = [
+            IndexModel([("token_version", ASCENDING)], partialFilterExpression={"token_version": {"$gt": 0}}),
+        ]
 
 class Package(Document):
     slug: Indexed(str, unique=True)
@@ -76,11 +167,20 @@ class Order(Document):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     expires_at: Optional[datetime] = None
     promo_code: Optional[str] = None
+    settled_by: Optional[str] = None  # claim of the scheduler run that last moved its status
     
     model_config = ConfigDict(arbitrary_types_allowed=True)
     
     class Settings:
         name = "orders"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("price_cents", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("status", ASCENDING), ("price_cents", DESCENDING), ("_id", DESCENDING)]),
+        ]
 
 class Payment(Document):
     order_id: PydanticObjectId
@@ -89,11 +189,19 @@ class Payment(Document):
     status: str = "pending"  # pending, success, failed
     payload: Dict[str, Any] = Field(default_factory=dict)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    due_at: Optional[datetime] = None  # when the payment scheduler should act on it
+    due_action: Optional[str] = None  # settle, expire
+    claimed_by: Optional[str] = None
+    claimed_at: Optional[datetime] = None
     
     model_config = ConfigDict(arbitrary_types_allowed=True)
     
     class Settings:
         name = "payments"
+        indexes = [
+            IndexModel([("order_id", ASCENDING)]),
+            IndexModel([("status", ASCENDING), ("due_at", ASCENDING)]),
+        ]
 
 class Ticket(Document):
     user_id: PydanticObjectId
@@ -107,6 +215,10 @@ class Ticket(Document):
     
     class Settings:
         name = "tickets"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ]
 
 class Announcement(Document):
     title: str
@@ -151,6 +263,9 @@ class ActivityLog(Document):
     
     class Settings:
         name = "activity_logs"
+        indexes = [
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ]
 
 class KnowledgeArticle(Document):
     title: str
@@ -162,6 +277,9 @@ class KnowledgeArticle(Document):
     
     class Settings:
         name = "knowledge_articles"
+        indexes = [
+            IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)]),
+        ]
 
 class Cart(Document):
     user_id: PydanticObjectId
@@ -175,20 +293,133 @@ class Cart(Document):
     
     class Settings:
         name = "carts"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("status", ASCENDING)]),
+        ]
 
 class Notification(Document):
-    user_id: PydanticObjectId
+    user_id: Optional[PydanticObjectId] = None  # None for broadcasts, stored once and merged into every feed
     title: str
     message: str
     type: str = "system"  # system, order, billing, announcement
     category: str = "system"  # promo, system, payment, expiry
     is_read: bool = False
+    read_at: Optional[datetime] = None  # drives the read-retention TTL index
+    broadcast_job_id: Optional[PydanticObjectId] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     
     model_config = ConfigDict(arbitrary_types_allowed=True)
     
     class Settings:
         name = "notifications"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+            IndexModel([("user_id", ASCENDING), ("is_read", ASCENDING), ("created_at", DESCENDING)]),
+            IndexModel(
+                [("broadcast_job_id", ASCENDING), ("user_id", ASCENDING)],
+                partialFilterExpression={"broadcast_job_id": {"$exists": True, "$type": "objectId"}}
+            ),
+        ]
+
+class ArchivedNotification(Document):
+    """Notification moved out of the live collection by the compaction job (same _id)"""
+    user_id: Optional[PydanticObjectId] = None
+    title: str
+    message: str
+    type: str = "system"
+    category: str = "system"
+    is_read: bool = False
+    read_at: Optional[datetime] = None
+    broadcast_job_id: Optional[PydanticObjectId] = None
+    created_at: datetime
+    archived_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    class Settings:
+        name = "notifications_archive"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        ]
+
+class NotificationState(Document):
+    """Per-user notification counters and broadcast read state; _id is the user's id"""
+    unread_count: int = 0  # unread personal notifications, kept in step with every insert and read
+    broadcasts_read_until: Optional[datetime] = None  # every broadcast up to here counts as read; None means signup
+    read_broadcast_ids: List[PydanticObjectId] = Field(default_factory=list)  # read individually after the watermark
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    class Settings:
+        name = "notification_states"
+
+class UserEvent(Document):
+    """Append-only activity log entry; the user timeline is a range read on (user_id, ts)"""
+    user_id: PydanticObjectId
+    kind: str  # order_created, payment_success, payment_failed, service_active, service_renewed, support_ticket, ticket_reply, referral_conversion
+    key: str  # "<kind>:<source id>[:n]", unique so replays and the backfill never duplicate an event
+    ts: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    data: Dict[str, Any] = Field(default_factory=dict)
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    class Settings:
+        name = "user_events"
+        indexes = [
+            IndexModel([("key", ASCENDING)], unique=True),
+            IndexModel([("user_id", ASCENDING), ("ts", DESCENDING), ("key", DESCENDING)]),
+        ]
+
+class UserVersions(Document):
+    """Per-user change counters behind the ETags of polled endpoints; _id is the user's id"""
+    notifications: int = 0
+    cart: int = 0
+    services: int = 0
+    
+    class Settings:
+        name = "user_versions"
+
+class MetricsCounter(Document):
+    """Global counters for one entity (orders, payments, ...); _id is the entity name"""
+    id: str
+    values: Dict[str, Any] = Field(default_factory=dict)
+    
+    class Settings:
+        name = "metrics_counters"
+
+class JobLease(Document):
+    """Time-limited claim on a periodic job so one worker runs it; _id is the job name"""
+    id: str
+    holder: str
+    expires_at: datetime
+    
+    class Settings:
+        name = "job_leases"
+
+class BroadcastJob(Document):
+    admin_user_id: PydanticObjectId
+    title: str
+    message: str
+    category: str = "system"
+    target: str = "all"
+    status: str = "pending"  # pending, running, completed, failed
+    total_users: int = 0
+    processed_users: int = 0
+    last_user_id: Optional[PydanticObjectId] = None  # resume point, users are walked in _id order
+    claimed_by: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    class Settings:
+        name = "broadcast_jobs"
+        indexes = [
+            IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        ]
 
 class SupportTicket(Document):
     user_id: PydanticObjectId
@@ -206,6 +437,11 @@ class SupportTicket(Document):
     
     class Settings:
         name = "support_tickets"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ]
 
 class Referral(Document):
     user_id: PydanticObjectId
@@ -246,6 +482,45 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+class TokenUser(BaseModel):
+    """Authenticated principal built from JWT claims, without a DB lookup"""
+    id: PydanticObjectId
+    email: str
+    name: str
+    role: str
+
+class AuthUser(BaseModel):
+    """Read-only snapshot of the user fields request handlers need, shared by AuthCache"""
+    model_config = ConfigDict(frozen=True, populate_by_name=True, arbitrary_types_allowed=True)
+    
+    id: PydanticObjectId = Field(alias="_id")
+    email: str
+    name: str
+    role: str = "user"
+    settings: Dict[str, Any] = Field(default_factory=dict)
+    created_at: datetime
+
+class OrderStatusView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    status: str
+    settled_by: Optional[str] = None
+
+class TokenVersionView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    token_version: int = 0
+
+class IdView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+
+class NotificationOwnerView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    user_id: Optional[PydanticObjectId] = None
+    is_read: bool = False
+
+class BroadcastView(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    created_at: datetime
+
 class UserResponse(BaseModel):
     id: str
     name: str
@@ -274,6 +549,34 @@ class PackageResponse(BaseModel):
     description: str
     created_at: datetime
 
+class CatalogPackage(BaseModel):
+    """Immutable package entry served from the in-memory catalog"""
+    model_config = ConfigDict(frozen=True, arbitrary_types_allowed=True)
+    
+    id: PydanticObjectId
+    slug: str
+    title: str
+    price_cents: int
+    features: Tuple[str, ...]
+    storage_mb: int
+    bandwidth_gb: int
+    description: str
+    created_at: datetime
+    
+    @classmethod
+    def from_document(cls, pkg: "Package") -> "CatalogPackage":
+        return cls(
+            id=pkg.id,
+            slug=pkg.slug,
+            title=pkg.title,
+            price_cents=pkg.price_cents,
+            features=tuple(pkg.features),
+            storage_mb=pkg.storage_mb,
+            bandwidth_gb=pkg.bandwidth_gb,
+            description=pkg.description,
+            created_at=pkg.created_at
+        )
+
 class OrderCreate(BaseModel):
     package_id: str
     domain: str
@@ -292,6 +595,15 @@ class OrderResponse(BaseModel):
     expires_at: Optional[datetime]
     promo_code: Optional[str]
 
+class PromoCreate(BaseModel):
+    code: str
+    discount_percent: int = Field(ge=1, le=100)
+    expires_at: datetime
+    usage_limit: int = Field(ge=1)
+
+class NotificationIds(BaseModel):
+    ids: List[str] = Field(min_length=1, max_length=500)
+
 class PaymentSimulate(BaseModel):
     method: str
     outcome: str  # success or failed
@@ -336,14 +648,155 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
-def create_access_token(data: dict) -> str:
+class PasswordHasher:
+    """Runs bcrypt hashing/verification on a dedicated thread pool.
+
+    bcrypt releases the GIL, so a small pool keeps the event loop free while
+    logins are being checked. At most ``queue_size`` jobs may be in flight;
+    beyond that requests are rejected with 503 instead of piling up.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(1, workers)
+        self.queue_size = max(self.workers, queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._pending = 0
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.queue_size:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(workers=PASSWORD_HASH_WORKERS, queue_size=PASSWORD_HASH_QUEUE_SIZE)
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=JWT_EXPIRATION)
+    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=JWT_EXPIRATION))
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+class AuthCache:
+    """In-process LRU cache of authenticated users, keyed by token subject.
+
+    Entries are frozen AuthUser snapshots, so they are handed out without
+    copying. Entries expire after ``ttl`` seconds and the least recently used
+    entry is evicted once ``max_size`` is reached. ``invalidate`` only clears
+    this worker: other workers serve a changed user (e.g. new settings on
+    /auth/me) for up to AUTH_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subject: str) -> Optional[AuthUser]:
+        entry = self._entries.get(subject)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, snapshot = entry
+        if expires_at <= time.monotonic():
+            del self._entries[subject]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        return snapshot
+
+    def set(self, subject: str, user: AuthUser) -> None:
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        self._entries[subject] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str) -> None:
+        self._entries.pop(subject, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0
+        }
+
+auth_cache = AuthCache(ttl=AUTH_CACHE_TTL_SECONDS, max_size=AUTH_CACHE_MAX_SIZE)
+
+class TokenVersionTable:
+    """Compact in-memory map of user id -> current token version.
+
+    Only users whose tokens were ever revoked (token_version > 0) are kept;
+    a partial index on token_version serves the reload. A background task
+    reloads the table every TOKEN_VERSION_REFRESH_SECONDS so revocations made
+    by other workers are picked up without a per-request lookup.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+
+    async def load(self) -> None:
+        rows = await User.find(User.token_version > 0).project(TokenVersionView).to_list()
+        self._versions = {str(row.id): row.token_version for row in rows}
+
+    def is_current(self, user_id: str, version: int) -> bool:
+        return version >= self._versions.get(user_id, 0)
+
+    async def revoke(self, user: User) -> Optional[User]:
+        """Invalidate every token issued to ``user`` so far and return the updated user.
+
+        A single $inc, so a concurrent write to other fields (settings) is never undone.
+        """
+        updated = await User.find_one(User.id == user.id).update(
+            Inc({User.token_version: 1}), response_type=UpdateResponse.NEW_DOCUMENT
+        )
+        if updated is not None:
+            self._versions[str(updated.id)] = updated.token_version
+        auth_cache.invalidate(user.email)
+        return updated
+
+token_versions = TokenVersionTable()
+
+def create_user_token(user: User) -> str:
+    return create_access_token(data={
+        "sub": user.email,
+        "uid": str(user.id),
+        "name": user.name,
+        "role": user.role,
+        "ver": user.token_version
+    })
+
+async def decode_access_token(token: str, scope: Optional[str] = None) -> Dict[str, Any]:
+    """Validate a JWT; ``scope`` must match the token's (None for session tokens)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -351,23 +804,519 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     )
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
-    except jwt.JWTError:
+    except jwt.PyJWTError:
+        raise credentials_exception
+    if payload.get("sub") is None or payload.get("scope") != scope:
         raise credentials_exception
     
-    user = await User.find_one(User.email == email)
+    if "uid" in payload:
+        if not token_versions.is_current(payload["uid"], payload.get("ver", 0)):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    return payload
+
+async def load_user(email: str) -> AuthUser:
+    user = auth_cache.get(email)
+    if user is not None:
+        return user
+    
+    user = await User.find_one(User.email == email).project(AuthUser)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    auth_cache.set(email, user)
     return user
 
-async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
-    if current_user.role != "admin":
+async def user_from_token(payload: Dict[str, Any]) -> AuthUser:
+    """Load the user behind a decoded token.
+
+    Tokens issued before the ``uid`` claim skip the version check in
+    decode_access_token. They are rejected here once the user has been revoked.
+    """
+    user = await load_user(payload["sub"])
+    if "uid" not in payload and not token_versions.is_current(str(user.id), 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> AuthUser:
+    payload = await decode_access_token(token)
+    return await user_from_token(payload)
+
+async def get_token_user(token: str = Depends(oauth2_scheme)) -> TokenUser:
+    """Authorize from JWT claims alone; legacy tokens fall back to a user lookup"""
+    payload = await decode_access_token(token)
+    if "uid" in payload and "role" in payload:
+        return TokenUser(
+            id=PydanticObjectId(payload["uid"]),
+            email=payload["sub"],
+            name=payload.get("name", ""),
+            role=payload["role"]
+        )
+    
+    user = await user_from_token(payload)
+    return TokenUser(id=user.id, email=user.email, name=user.name, role=user.role)
+
+async def get_admin_user(token: str = Depends(oauth2_scheme)) -> TokenUser:
+    """Require an admin, re-checking the role claim against the stored user.
+
+    A role change does not revoke the tokens already issued, so the claim
+    alone would keep a demoted admin in until the token expires. The lookup
+    goes through the auth cache, so a demotion applies within
+    AUTH_CACHE_TTL_SECONDS and admin routes cost no extra query when warm.
+    """
+    payload = await decode_access_token(token)
+    if payload.get("role", "admin") != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    
+    user = await user_from_token(payload)
+    if user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
-    return current_user
+    return TokenUser(id=user.id, email=user.email, name=user.name, role=user.role)
+
+async def get_stream_user(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    access_token: Optional[str] = Query(None)
+) -> AuthUser:
+    """Like get_current_user, but also accepts ``?access_token=`` (EventSource cannot send headers).
+
+    Query-string tokens end up in access logs, so only short-lived stream
+    tokens from /auth/stream-token are accepted there.
+    """
+    if token:
+        payload = await decode_access_token(token)
+    elif access_token:
+        payload = await decode_access_token(access_token, scope="stream")
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await user_from_token(payload)
+
+class InMemoryBroker:
+    """In-process publish/subscribe broker keyed by channel name.
+
+    Each subscriber gets its own bounded queue; a subscriber that falls behind
+    loses events rather than blocking publishers. Only reaches subscribers
+    connected to this worker.
+    """
+
+    def __init__(self, queue_size: int = 16):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, set] = defaultdict(set)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def subscribe(self, channel: str, queue: Optional[asyncio.Queue] = None) -> asyncio.Queue:
+        """Subscribe to channel; pass an existing queue to listen on several channels at once"""
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[channel].add(queue)
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(channel)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[channel]
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        self._deliver(channel, message)
+
+    async def publish_many(self, messages: List[Tuple[str, Dict[str, Any]]]) -> None:
+        for channel, message in messages:
+            self._deliver(channel, message)
+
+    def _deliver(self, channel: str, message: Dict[str, Any]) -> None:
+        for queue in self._subscribers.get(channel, ()):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning("Dropping event for slow subscriber on %s", channel)
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+class MongoBroker(InMemoryBroker):
+    """Broker shared by all workers through a capped MongoDB collection.
+
+    Publishing appends to the capped collection; every worker tails it with a
+    tailable cursor and delivers matching events to its local subscribers.
+    Any reachable mongod (including a local one) can serve as the backend.
+    """
+
+    def __init__(self, database, collection_name: str, capped_size: int, queue_size: int = 16):
+        super().__init__(queue_size=queue_size)
+        self.database = database
+        self.collection_name = collection_name
+        self.capped_size = capped_size
+        self._tail_task: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self):
+        return self.database[self.collection_name]
+
+    async def start(self) -> None:
+        try:
+            await self.database.create_collection(self.collection_name, capped=True, size=self.capped_size)
+        except CollectionInvalid:
+            pass  # already exists
+        self._tail_task = asyncio.create_task(self._tail(), name="broker-tail")
+
+    async def stop(self) -> None:
+        if self._tail_task:
+            self._tail_task.cancel()
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        await self.publish_many([(channel, message)])
+
+    async def publish_many(self, messages: List[Tuple[str, Dict[str, Any]]]) -> None:
+        if not messages:
+            return
+        now = datetime.now(timezone.utc)
+        await self.collection.insert_many([
+            {"channel": channel, "message": message, "created_at": now}
+            for channel, message in messages
+        ])
+
+    async def _tail(self) -> None:
+        last = await self.collection.find_one({}, sort=[("$natural", -1)])
+        last_id = last["_id"] if last else None
+        while True:
+            try:
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                # An await getMore that times out with nothing new ends `async for`,
+                # but the cursor is still open; keep waiting on it rather than
+                # issuing a fresh find
+                while cursor.alive:
+                    try:
+                        doc = await cursor.next()
+                    except StopAsyncIteration:
+                        continue
+                    last_id = doc["_id"]
+                    if doc["channel"] in self._subscribers:
+                        self._deliver(doc["channel"], doc["message"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Broker tail cursor failed, restarting")
+            # The cursor died (e.g. on an empty collection); back off and resume
+            # from the last seen _id
+            await asyncio.sleep(1)
+
+def create_broker() -> InMemoryBroker:
+    if BROKER_BACKEND == "mongo":
+        return MongoBroker(client[db_name], BROKER_COLLECTION, BROKER_CAPPED_SIZE_BYTES)
+    return InMemoryBroker()
+
+broker = create_broker()
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class PackageCatalog:
+    """Process-wide, immutable snapshot of all packages.
+
+    The snapshot is indexed by id and slug and keeps the pre-serialized
+    ``/api/packages`` body plus its ETag. It is rebuilt at startup, after every
+    package write and every PACKAGE_CATALOG_REFRESH_SECONDS; a rebuild swaps
+    the whole snapshot at once so readers never see a partial catalog.
+    """
+
+    def __init__(self):
+        self.packages: Tuple[CatalogPackage, ...] = ()
+        self._by_id: MappingProxyType = MappingProxyType({})
+        self._by_slug: MappingProxyType = MappingProxyType({})
+        self.body = b"[]"
+        self.etag = '"empty"'
+
+    async def reload(self) -> None:
+        docs = await Package.find_all().sort(+Package.created_at).to_list()
+        packages = tuple(CatalogPackage.from_document(pkg) for pkg in docs)
+        body = json.dumps([
+            {
+                "id": str(pkg.id),
+                "slug": pkg.slug,
+                "title": pkg.title,
+                "price_cents": pkg.price_cents,
+                "features": list(pkg.features),
+                "storage_mb": pkg.storage_mb,
+                "bandwidth_gb": pkg.bandwidth_gb,
+                "description": pkg.description,
+                "created_at": pkg.created_at.isoformat()
+            }
+            for pkg in packages
+        ], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        
+        self.packages = packages
+        self._by_id = MappingProxyType({str(pkg.id): pkg for pkg in packages})
+        self._by_slug = MappingProxyType({pkg.slug: pkg for pkg in packages})
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+    def get(self, package_id: Any) -> Optional[CatalogPackage]:
+        if package_id is None:
+            return None
+        return self._by_id.get(str(package_id))
+
+    def get_by_slug(self, slug: str) -> Optional[CatalogPackage]:
+        return self._by_slug.get(slug)
+
+package_catalog = PackageCatalog()
+
+async def resolve_packages(package_ids) -> Dict[str, CatalogPackage]:
+    """Resolve many package ids at once: catalog first, then one $in query for the rest"""
+    resolved: Dict[str, CatalogPackage] = {}
+    missing = set()
+    for package_id in package_ids:
+        if package_id is None:
+            continue
+        package = package_catalog.get(package_id)
+        if package:
+            resolved[str(package_id)] = package
+        else:
+            missing.add(PydanticObjectId(package_id))
+    
+    if missing:
+        docs = await Package.find(In(Package.id, list(missing))).to_list()
+        for pkg in docs:
+            resolved[str(pkg.id)] = CatalogPackage.from_document(pkg)
+    return resolved
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check an If-None-Match header against ``etag``"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or any(
+        (value[2:] if value.startswith("W/") else value) == etag for value in candidates
+    )
+
+async def bump_user_versions(scope: str, user_ids: Iterable[PydanticObjectId]) -> None:
+    """Invalidate the ``scope`` ETag of every user in user_ids (one bulk write)"""
+    operations = [
+        UpdateOne({"_id": user_id}, {"$inc": {scope: 1}}, upsert=True)
+        for user_id in set(user_ids) if user_id is not None
+    ]
+    if operations:
+        await UserVersions.get_pymongo_collection().bulk_write(operations, ordered=False)
+
+async def user_etag(user_id: PydanticObjectId, scope: str, extra: str = "") -> str:
+    """ETag for a per-user resource, from one point read of its version.
+
+    Read the version before the data it describes: a write landing in
+    between then only costs the client one extra full response.
+    """
+    versions = await UserVersions.get(user_id)
+    version = getattr(versions, scope) if versions else 0
+    return f'"{scope}-{user_id}-{version}{extra}"'
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+def encode_cursor(sort_field: str, sort_value: Any, doc_id: Any) -> str:
+    """Encode an opaque keyset cursor for (sort_field, sort_value, _id)"""
+    if isinstance(sort_value, datetime):
+        value = {"dt": sort_value.isoformat()}
+    else:
+        value = {"v": sort_value}
+    raw = json.dumps({"f": sort_field, "id": str(doc_id), **value}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+# Sort fields that are not datetimes; cursor values of any other type are rejected
+CURSOR_VALUE_TYPES: Dict[str, type] = {"price_cents": int}
+
+def decode_cursor(cursor: str, sort_field: str, parse_id: Callable[[str], Any] = PydanticObjectId) -> Tuple[Any, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if data["f"] != sort_field:
+            raise ValueError("cursor was issued for a different sort")
+        # The value lands in a Mongo filter, so anything but the field's own
+        # type (e.g. {"$ne": null}) could inject an operator
+        expected = CURSOR_VALUE_TYPES.get(sort_field, datetime)
+        value = datetime.fromisoformat(data["dt"]) if expected is datetime else data["v"]
+        if type(value) is not expected or not isinstance(data["id"], str):
+            raise ValueError("cursor value does not match the sort field")
+        return value, parse_id(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(
+    sort_field: str,
+    cursor: Optional[str],
+    descending: bool = True,
+    id_field: str = "_id",
+    parse_id: Callable[[str], Any] = PydanticObjectId
+) -> Dict[str, Any]:
+    """Mongo filter selecting documents after ``cursor`` in (sort_field, id_field) order"""
+    if not cursor:
+        return {}
+    value, doc_id = decode_cursor(cursor, sort_field, parse_id)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {sort_field: {op: value}},
+        {sort_field: value, id_field: {op: doc_id}}
+    ]}
+
+class PageParams:
+    """Common ``cursor``/``limit`` query parameters for list endpoints"""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX)
+    ):
+        self.cursor = cursor
+        self.limit = limit
+
+async def paginate(
+    model,
+    filters: Dict[str, Any],
+    page: PageParams,
+    sort_field: str = "created_at",
+    descending: bool = True
+) -> Tuple[List[Any], Optional[str]]:
+    """Fetch one keyset page of ``model`` ordered by (sort_field, _id).
+
+    Returns the documents and the cursor for the next page (None on the last page).
+    """
+    criteria = [filters]
+    page_filter = keyset_filter(sort_field, page.cursor, descending)
+    if page_filter:
+        criteria.append(page_filter)
+    
+    prefix = "-" if descending else "+"
+    docs = await model.find(*criteria).sort(
+        f"{prefix}{sort_field}", f"{prefix}_id"
+    ).limit(page.limit + 1).to_list()
+    
+    next_cursor = None
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        next_cursor = encode_cursor(sort_field, getattr(docs[-1], sort_field), docs[-1].id)
+    return docs, next_cursor
+
+class _Newest:
+    """Heap entry that pops the largest (ts, key) first"""
+    __slots__ = ("sort_key", "item", "source")
+
+    def __init__(self, sort_key: Tuple[Any, str], item: Any, source: AsyncGenerator):
+        self.sort_key = sort_key
+        self.item = item
+        self.source = source
+
+    def __lt__(self, other: "_Newest") -> bool:
+        return self.sort_key > other.sort_key
+
+async def merge_newest(
+    sources: List[AsyncGenerator[Any, None]],
+    sort_key: Callable[[Any], Tuple[Any, str]],
+    limit: int
+) -> List[Any]:
+    """Lazily k-way merge sources that are each sorted newest first.
+
+    Holds one pending item per source in a heap and pulls the next item only
+    from the source that was just consumed, so at most ``limit`` items plus
+    one per source are ever in memory. Every source is closed on return, so
+    cursors left open by a full page are released right away.
+    """
+    heap: List[_Newest] = []
+    merged = []
+    try:
+        for source in sources:
+            item = await anext(source, None)
+            if item is not None:
+                heap.append(_Newest(sort_key(item), item, source))
+        heapq.heapify(heap)
+        
+        while heap and len(merged) < limit:
+            entry = heapq.heappop(heap)
+            merged.append(entry.item)
+            item = await anext(entry.source, None)
+            if item is not None:
+                heapq.heappush(heap, _Newest(sort_key(item), item, entry.source))
+    finally:
+        for source in sources:
+            await source.aclose()
+    return merged
+
+ACTIVITY_SOURCES = ("order", "support", "referral")
+
+def parse_activity_key(key: str) -> Tuple[str, PydanticObjectId]:
+    """Split a merged activity key "<source>:<_id>" into its source and ObjectId"""
+    prefix, _, doc_id = key.partition(":")
+    if prefix not in ACTIVITY_SOURCES:
+        raise ValueError("unknown activity source")
+    return prefix, PydanticObjectId(doc_id)
+
+def merged_source_filter(
+    prefix: str,
+    cursor: Optional[Tuple[datetime, Tuple[str, PydanticObjectId]]],
+    sort_field: str = "created_at"
+) -> Dict[str, Any]:
+    """Filter for one source of a merged feed keyed "<prefix>:<_id>", resuming after cursor"""
+    if cursor is None:
+        return {}
+    ts, (cursor_prefix, cursor_id) = cursor
+    if prefix == cursor_prefix:
+        return {"$or": [
+            {sort_field: {"$lt": ts}},
+            {sort_field: ts, "_id": {"$lt": cursor_id}}
+        ]}
+    # Items of other sources at the cursor's timestamp sort entirely before or
+    # after it; no source name is a prefix of another, so the names decide
+    return {sort_field: {"$lte" if prefix < cursor_prefix else "$lt": ts}}
+
+async def redeem_promo(code: str) -> Optional[Promo]:
+    """Atomically claim one use of a promo code.
+
+    Expiry and usage-limit checks live in the filter of a single
+    find_one_and_update, so concurrent orders can never over-redeem.
+    Returns the updated promo, or None if the code is unknown, expired or used up.
+    """
+    return await Promo.find_one({
+        "code": code,
+        "expires_at": {"$gt": datetime.now(timezone.utc)},
+        "$expr": {"$lt": ["$usage_count", "$usage_limit"]}
+    }).update(Inc({Promo.usage_count: 1}), response_type=UpdateResponse.NEW_DOCUMENT)
+
+async def release_promo(code: str) -> None:
+    """Give back a use claimed by redeem_promo (e.g. when the order insert fails)"""
+    await Promo.find_one({"code": code, "usage_count": {"$gt": 0}}).update(Inc({Promo.usage_count: -1}))
+
+def referral_code_for(user_id: PydanticObjectId) -> str:
+    """Referral code derived from the whole user id.
+
+    The id's leading hex digits are its creation second, so a prefix would
+    collide for users who sign up in the same second.
+    """
+    return f"REF{str(user_id).upper()}"
 
 def check_domain_availability(domain: str) -> bool:
     """Dummy domain checker using consistent hashing"""
@@ -397,19 +1346,1005 @@ def get_ai_response(query: str) -> Dict[str, Any]:
 app = FastAPI(title="HostingIn API")
 api_router = APIRouter(prefix="/api")
 
+# ==================== INDEX VERIFICATION ====================
+
+DOCUMENT_MODELS = [
+    User, Package, Order, Payment, Ticket,
+    Announcement, Promo, Affiliate, ActivityLog, KnowledgeArticle,
+    Cart, Notification, SupportTicket, Referral, UserProfile, BroadcastJob,
+    NotificationState, UserVersions, ArchivedNotification, UserEvent, MetricsCounter, JobLease
+]
+
+def _index_key(key: Dict[str, Any]) -> Tuple:
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in key.items())
+
+async def verify_indexes() -> Dict[str, Any]:
+    """Compare declared indexes with the ones present in MongoDB.
+
+    Reports declared indexes that are missing and existing indexes that have
+    not served a single operation since the server (re)started, per collection.
+    """
+    report: Dict[str, Any] = {}
+    for model in DOCUMENT_MODELS:
+        collection = model.get_collection_name()
+        stats = await model.aggregate([{"$indexStats": {}}]).to_list()
+        existing = {_index_key(st["key"]) for st in stats}
+        declared = [_index_key(ix.index.document["key"]) for ix in model.get_settings().indexes]
+        
+        missing = [dict(key) for key in declared if key not in existing]
+        unused = [
+            {"name": st["name"], "since": st["accesses"]["since"].isoformat()}
+            for st in stats
+            if st["name"] != "_id_" and st["accesses"]["ops"] == 0
+        ]
+        report[collection] = {"missing": missing, "unused": unused}
+        
+        for key in missing:
+            logger.warning("Missing index on %s: %s", collection, key)
+        for index in unused:
+            logger.info("Unused index on %s: %s (no ops since %s)", collection, index["name"], index["since"])
+    return report
+
+# ==================== BACKGROUND TASKS ====================
+
+_background_tasks: List[asyncio.Task] = []
+
+def run_periodically(name: str, interval_seconds: float, job: Callable[[], Awaitable[Any]]) -> None:
+    """Run ``job`` every ``interval_seconds`` for the lifetime of the app"""
+    async def loop():
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Background task %s failed", name)
+    
+    _background_tasks.append(asyncio.create_task(loop(), name=name))
+
+WORKER_ID = uuid.uuid4().hex
+
+async def acquire_lease(name: str, seconds: float) -> bool:
+    """Claim job ``name`` for ``seconds`` unless another worker holds an unexpired lease.
+
+    A single upsert filtered on an expired lease: when the lease is still
+    held nothing matches, the insert collides on _id, and the claim fails.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await JobLease.get_pymongo_collection().find_one_and_update(
+            {"_id": name, "expires_at": {"$lte": now}},
+            {"$set": {"holder": WORKER_ID, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+def leased(name: str, seconds: float, job: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+    """Wrap ``job`` so that at most one worker runs it every ``seconds``"""
+    async def run():
+        if await acquire_lease(name, seconds):
+            return await job()
+        return None
+    return run
+
+# ==================== USER EVENTS ====================
+
+def order_created_event(order: Order) -> UserEvent:
+    return user_event(order.user_id, "order_created", order.id, order.created_at,
+                      domain=order.domain, package_id=order.package_id, price_cents=order.price_cents)
+
+def user_event(user_id: PydanticObjectId, kind: str, ref: Any, ts: Optional[datetime] = None, **data: Any) -> UserEvent:
+    event = UserEvent(user_id=user_id, kind=kind, key=f"{kind}:{ref}", data=data)
+    if ts is not None:
+        event.ts = ts
+    return event
+
+async def record_events(*events: UserEvent) -> None:
+    """Append events to the user log; events already recorded (same key) are skipped"""
+    if not events:
+        return
+    try:
+        await UserEvent.insert_many(list(events), ordered=False)
+    except BulkWriteError as exc:
+        if any(error["code"] != 11000 for error in exc.details.get("writeErrors", [])):
+            raise
+
+async def backfill_user_events(batch_size: int = 1000) -> Dict[str, int]:
+    """Build the event log in bulk from orders, payments, support tickets and referrals.
+
+    Idempotent thanks to the unique event keys, so it can be re-run at any
+    time. Renewals leave no trace in the source collections and cannot be
+    recovered. Returns the number of events offered per source.
+    """
+    counts: Dict[str, int] = defaultdict(int)
+    pending: List[UserEvent] = []
+    
+    async def emit(source: str, *events: UserEvent) -> None:
+        nonlocal pending
+        pending.extend(events)
+        counts[source] += len(events)
+        if len(pending) >= batch_size:
+            await record_events(*pending)
+            pending = []
+    
+    async for order in Order.get_pymongo_collection().find({}):
+        await emit("orders", user_event(
+            order["user_id"], "order_created", order["_id"], order["created_at"],
+            domain=order["domain"], package_id=order.get("package_id"), price_cents=order["price_cents"]
+        ))
+        if order.get("status") == "active" and order.get("expires_at"):
+            await emit("orders", user_event(
+                order["user_id"], "service_active", order["_id"], order["created_at"],
+                domain=order["domain"], expires_at=order["expires_at"]
+            ))
+    
+    payments = Payment.get_pymongo_collection().aggregate([
+        {"$match": {"status": {"$in": ["success", "failed"]}}},
+        {"$lookup": {
+            "from": Order.get_collection_name(),
+            "localField": "order_id",
+            "foreignField": "_id",
+            "as": "order"
+        }},
+        {"$unwind": "$order"},
+        {"$project": {"status": 1, "amount_cents": 1, "method": 1, "created_at": 1, "user_id": "$order.user_id"}}
+    ])
+    async for payment in payments:
+        kind = "payment_success" if payment["status"] == "success" else "payment_failed"
+        await emit("payments", user_event(
+            payment["user_id"], kind, payment["_id"], payment["created_at"],
+            amount_cents=payment["amount_cents"], method=payment["method"]
+        ))
+    
+    async for ticket in SupportTicket.get_pymongo_collection().find({}):
+        await emit("support_tickets", user_event(
+            ticket["user_id"], "support_ticket", ticket["_id"], ticket["created_at"],
+            subject=ticket["subject"], status=ticket["status"], replies_count=len(ticket.get("replies", []))
+        ))
+        for index, reply in enumerate(ticket.get("replies", [])):
+            replied_at = datetime.fromisoformat(reply["timestamp"]) if reply.get("timestamp") else ticket["created_at"]
+            await emit("support_tickets", user_event(
+                ticket["user_id"], "ticket_reply", f"{ticket['_id']}:{index}", replied_at,
+                subject=ticket["subject"], ticket_id=str(ticket["_id"])
+            ))
+    
+    async for referral in Referral.get_pymongo_collection().find({"conversions": {"$gt": 0}}):
+        # Conversion times were never stored; date them at the referral's creation
+        for number in range(1, referral["conversions"] + 1):
+            await emit("referrals", user_event(
+                referral["user_id"], "referral_conversion", f"{referral['_id']}:{number}", referral["created_at"],
+                conversions=number
+            ))
+    
+    await record_events(*pending)
+    return dict(counts)
+
+# ==================== NOTIFICATION DELIVERY ====================
+
+BROADCAST_CHANNEL = "notifications:broadcast"
+
+def as_utc(value: datetime) -> datetime:
+    """Mongo hands datetimes back naive; treat them as UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def receives_broadcasts(user: AuthUser) -> bool:
+    return user.role == "user"
+
+async def get_notification_state(user: AuthUser) -> NotificationState:
+    """Notification state for user; a user who never read a broadcast starts at signup"""
+    state = await NotificationState.get(user.id) or NotificationState(id=user.id)
+    if state.broadcasts_read_until is None:
+        state.broadcasts_read_until = user.created_at
+    return state
+
+class BroadcastIndex:
+    """Process-wide sorted list of broadcast ids and send times.
+
+    Broadcasts are rare admin actions, so every worker keeps all of them in
+    memory and counts a user's unread broadcasts without touching MongoDB.
+    Refreshed every BROADCAST_INDEX_REFRESH_SECONDS and after local broadcasts.
+    """
+
+    def __init__(self):
+        self._times: List[datetime] = []
+        self._ids: List[PydanticObjectId] = []
+        self._sent_at: Dict[PydanticObjectId, datetime] = {}
+
+    async def reload(self) -> None:
+        docs = await Notification.find(Notification.user_id == None).sort(
+            +Notification.created_at
+        ).project(BroadcastView).to_list()
+        self._times = [as_utc(d.created_at) for d in docs]
+        self._ids = [d.id for d in docs]
+        self._sent_at = dict(zip(self._ids, self._times))
+
+    def add(self, notification: Notification) -> None:
+        if notification.id in self._sent_at:
+            return
+        sent_at = as_utc(notification.created_at)
+        position = bisect_right(self._times, sent_at)
+        self._times.insert(position, sent_at)
+        self._ids.insert(position, notification.id)
+        self._sent_at[notification.id] = sent_at
+
+    @property
+    def version(self) -> str:
+        return f"{len(self._ids)}.{self._ids[-1]}" if self._ids else "0"
+
+    def unread_count(self, state: NotificationState) -> int:
+        watermark = as_utc(state.broadcasts_read_until)
+        newer = len(self._times) - bisect_right(self._times, watermark)
+        read = sum(1 for i in state.read_broadcast_ids if self._sent_at.get(i, watermark) > watermark)
+        return max(0, newer - read)
+
+broadcast_index = BroadcastIndex()
+
+async def unread_notification_count(user: AuthUser) -> int:
+    """Unread personal notifications plus unread broadcasts, from one point read"""
+    state = await get_notification_state(user)
+    count = max(0, state.unread_count)
+    if receives_broadcasts(user):
+        count += broadcast_index.unread_count(state)
+    return count
+
+async def adjust_unread_counts(deltas: Dict[PydanticObjectId, int]) -> None:
+    """Apply per-user unread counter changes in one bulk write"""
+    operations = [
+        UpdateOne({"_id": user_id}, {"$inc": {"unread_count": delta}}, upsert=True)
+        for user_id, delta in deltas.items() if delta
+    ]
+    if operations:
+        await NotificationState.get_pymongo_collection().bulk_write(operations, ordered=False)
+
+def notification_feed_filter(user: AuthUser) -> Dict[str, Any]:
+    """Personal notifications plus broadcasts sent since the user signed up"""
+    personal = {"user_id": user.id}
+    if not receives_broadcasts(user):
+        return personal
+    return {"$or": [personal, {"user_id": None, "created_at": {"$gte": user.created_at}}]}
+
+def unread_broadcasts_filter(state: NotificationState) -> Dict[str, Any]:
+    return {
+        "user_id": None,
+        "created_at": {"$gt": state.broadcasts_read_until},
+        "_id": {"$nin": state.read_broadcast_ids}
+    }
+
+def notification_payload(n: Notification, state: Optional[NotificationState] = None) -> Dict[str, Any]:
+    is_read = n.is_read
+    if n.user_id is None and state is not None:
+        is_read = (as_utc(n.created_at) <= as_utc(state.broadcasts_read_until)
+                   or n.id in state.read_broadcast_ids)
+    return {
+        "id": str(n.id),
+        "title": n.title,
+        "message": n.message,
+        "type": n.type,
+        "category": n.category,
+        "is_read": is_read,
+        "created_at": n.created_at.isoformat()
+    }
+
+async def push_notification(notification: Notification) -> Notification:
+    """Store a notification and push it to the user's live channel"""
+    await notification.insert()
+    # Counter and version live in different collections; the insert must land
+    # first so a client that sees the new version also sees the notification
+    await asyncio.gather(
+        adjust_unread_counts({notification.user_id: 1} if not notification.is_read else {}),
+        bump_user_versions("notifications", [notification.user_id])
+    )
+    await broker.publish(
+        f"notifications:{notification.user_id}",
+        {"event": "notification", "notification": notification_payload(notification)}
+    )
+    return notification
+
+async def push_notifications(notifications: List[Notification]) -> None:
+    """Bulk variant of push_notification (one insert_many)"""
+    if not notifications:
+        return
+    # insert_many does not write generated ids back onto the documents
+    for notification in notifications:
+        notification.id = notification.id or PydanticObjectId()
+    await Notification.insert_many(notifications)
+    await asyncio.gather(
+        adjust_unread_counts(Counter(n.user_id for n in notifications if not n.is_read)),
+        bump_user_versions("notifications", (n.user_id for n in notifications))
+    )
+    await broker.publish_many([
+        (f"notifications:{n.user_id}", {"event": "notification", "notification": notification_payload(n)})
+        for n in notifications
+    ])
+
+async def push_broadcast(notification: Notification) -> Notification:
+    """Store a broadcast once and push it to every connected user"""
+    notification.user_id = None
+    await notification.insert()
+    broadcast_index.add(notification)
+    await broker.publish(
+        BROADCAST_CHANNEL,
+        {"event": "notification", "notification": notification_payload(notification)}
+    )
+    return notification
+
+async def publish_notifications_read(user_id: PydanticObjectId, ids: Optional[List[str]] = None) -> None:
+    """Tell the user's open tabs that notifications were read (all of them if ids is None)"""
+    await broker.publish(f"notifications:{user_id}", {"event": "read", "ids": ids})
+
+async def mark_notifications_read(user: AuthUser, ids: Optional[List[PydanticObjectId]] = None) -> int:
+    """Mark the given notifications (all if ids is None) read and return how many changed.
+
+    Personal notifications are flipped with one update_many on the
+    (user_id, is_read) index; broadcasts only touch the user's read state.
+    """
+    personal = Notification.find(
+        Notification.user_id == user.id,
+        Notification.is_read == False,
+        *([In(Notification.id, ids)] if ids is not None else [])
+    )
+    result = await personal.update_many(Set({
+        Notification.is_read: True,
+        Notification.read_at: datetime.now(timezone.utc)
+    }))
+    marked = result.modified_count
+    await adjust_unread_counts({user.id: -marked})
+    
+    if receives_broadcasts(user):
+        state = await get_notification_state(user)
+        if ids is None:
+            marked += broadcast_index.unread_count(state)
+            # Moving the watermark marks every earlier broadcast read and empties the read-set
+            await NotificationState.find_one(NotificationState.id == user.id).update(
+                Set({
+                    NotificationState.broadcasts_read_until: datetime.now(timezone.utc),
+                    NotificationState.read_broadcast_ids: []
+                }),
+                upsert=True
+            )
+        else:
+            broadcasts = await Notification.find(
+                In(Notification.id, ids),
+                unread_broadcasts_filter(state)
+            ).project(IdView).to_list()
+            if broadcasts:
+                await NotificationState.find_one(NotificationState.id == user.id).update(
+                    AddToSet({NotificationState.read_broadcast_ids: {"$each": [b.id for b in broadcasts]}}),
+                    upsert=True
+                )
+                marked += len(broadcasts)
+    
+    if marked:
+        await bump_user_versions("notifications", [user.id])
+        await publish_notifications_read(user.id, [str(i) for i in ids] if ids is not None else None)
+    return marked
+
+async def reconcile_unread_counts() -> int:
+    """Recompute every personal unread counter from the notifications themselves.
+
+    Counters only drift if a process dies between a write and its counter
+    update, so this runs rarely, on one worker at a time (see leased). Users
+    are walked in _id order, UNREAD_RECONCILE_BATCH_SIZE at a time, so each
+    $group and $in stays bounded. A write racing with the recount can leave
+    its user off by one until the next run. Returns the number of counters fixed.
+    """
+    fixed = 0
+    last_id = None
+    while True:
+        user_ids = [
+            user.id for user in await User.find(
+                {"_id": {"$gt": last_id}} if last_id else {}
+            ).sort(+User.id).limit(UNREAD_RECONCILE_BATCH_SIZE).project(IdView).to_list()
+        ]
+        if not user_ids:
+            break
+        last_id = user_ids[-1]
+        
+        actual = {
+            row["_id"]: row["count"]
+            for row in await Notification.aggregate([
+                {"$match": {"user_id": {"$in": user_ids}, "is_read": False}},
+                {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+            ]).to_list()
+        }
+        stored = {
+            row["_id"]: row.get("unread_count", 0)
+            for row in await NotificationState.get_pymongo_collection().find(
+                {"_id": {"$in": user_ids}}, {"unread_count": 1}
+            ).to_list(None)
+        }
+        
+        fixes = {user_id: count for user_id, count in actual.items() if stored.get(user_id) != count}
+        fixes.update({user_id: 0 for user_id, count in stored.items() if user_id not in actual and count != 0})
+        if fixes:
+            await NotificationState.get_pymongo_collection().bulk_write([
+                UpdateOne({"_id": user_id}, {"$set": {"unread_count": count}}, upsert=True)
+                for user_id, count in fixes.items()
+            ], ordered=False)
+            await bump_user_versions("notifications", fixes)
+            fixed += len(fixes)
+        
+        if len(user_ids) < UNREAD_RECONCILE_BATCH_SIZE:
+            break
+    
+    if fixed:
+        logger.info("Reconciled %d unread notification counters", fixed)
+    return fixed
+
+# ==================== NOTIFICATION RETENTION ====================
+
+NOTIFICATION_READ_TTL_INDEX = "read_at_ttl"
+
+async def ensure_notification_retention() -> None:
+    """Create the read-notification TTL index, or retune it if the retention changed.
+
+    Kept out of Notification.Settings because init_beanie cannot change
+    expireAfterSeconds on an existing index; collMod can.
+    """
+    collection = Notification.get_pymongo_collection()
+    expire_after = NOTIFICATION_READ_RETENTION_DAYS * 86400
+    try:
+        await collection.create_index(
+            [("read_at", ASCENDING)],
+            name=NOTIFICATION_READ_TTL_INDEX,
+            expireAfterSeconds=expire_after,
+            partialFilterExpression={"read_at": {"$type": "date"}}
+        )
+    except OperationFailure as exc:
+        if exc.code != 85:  # IndexOptionsConflict
+            raise
+        await collection.database.command(
+            "collMod", collection.name,
+            index={"name": NOTIFICATION_READ_TTL_INDEX, "expireAfterSeconds": expire_after}
+        )
+
+async def archive_notifications(batch: List[Dict[str, Any]]) -> None:
+    """Copy raw notification documents into notifications_archive, then delete them.
+
+    Copies keep their _id, so a batch interrupted between insert and delete
+    is simply redone on the next run.
+    """
+    archived_at = datetime.now(timezone.utc)
+    try:
+        await ArchivedNotification.get_pymongo_collection().insert_many(
+            [{**doc, "archived_at": archived_at} for doc in batch], ordered=False
+        )
+    except BulkWriteError as exc:
+        # Copies left by an interrupted run are fine; anything else is not
+        if any(error["code"] != 11000 for error in exc.details.get("writeErrors", [])):
+            raise
+    await Notification.get_pymongo_collection().delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+
+async def compact_notifications() -> int:
+    """Move personal notifications older than NOTIFICATION_ARCHIVE_AFTER_DAYS
+    that the TTL index will never remove (unread ones, pre-read_at documents)
+    into notifications_archive, one batch at a time, then expire old broadcasts.
+
+    Batches are walked on _id, whose embedded timestamp stands in for
+    created_at, so no extra index is needed.
+    """
+    cutoff = PydanticObjectId.from_datetime(
+        datetime.now(timezone.utc) - timedelta(days=NOTIFICATION_ARCHIVE_AFTER_DAYS)
+    )
+    live = Notification.get_pymongo_collection()
+    moved = 0
+    
+    while True:
+        # Broadcasts are shared by every feed and expire on their own schedule
+        batch = await live.find(
+            {"_id": {"$lt": cutoff}, "user_id": {"$ne": None}, "read_at": None}
+        ).sort("_id", ASCENDING).limit(NOTIFICATION_COMPACTION_BATCH_SIZE).to_list(None)
+        if not batch:
+            break
+        
+        await archive_notifications(batch)
+        unread = Counter(doc["user_id"] for doc in batch if not doc.get("is_read"))
+        await adjust_unread_counts({user_id: -count for user_id, count in unread.items()})
+        await bump_user_versions("notifications", (doc["user_id"] for doc in batch))
+        moved += len(batch)
+        
+        if len(batch) < NOTIFICATION_COMPACTION_BATCH_SIZE:
+            break
+    
+    if moved:
+        logger.info("Archived %d notifications", moved)
+    return moved + await expire_broadcasts()
+
+async def expire_broadcasts() -> int:
+    """Archive broadcasts older than BROADCAST_RETENTION_DAYS.
+
+    Archiving a broadcast drops it from every user's feed and unread count at
+    once, so its id is also pulled from each user's read_broadcast_ids, which
+    would otherwise keep it forever.
+    """
+    cutoff = PydanticObjectId.from_datetime(
+        datetime.now(timezone.utc) - timedelta(days=BROADCAST_RETENTION_DAYS)
+    )
+    batch = await Notification.get_pymongo_collection().find(
+        {"_id": {"$lt": cutoff}, "user_id": None}
+    ).to_list(None)
+    if not batch:
+        return 0
+    
+    await archive_notifications(batch)
+    ids = [doc["_id"] for doc in batch]
+    await NotificationState.get_pymongo_collection().update_many(
+        {"read_broadcast_ids": {"$in": ids}},
+        {"$pull": {"read_broadcast_ids": {"$in": ids}}}
+    )
+    # The index version feeds every notification ETag, so feeds refresh too
+    await broadcast_index.reload()
+    logger.info("Archived %d broadcasts", len(batch))
+    return len(batch)
+
+# ==================== BROADCAST JOBS ====================
+
+def broadcast_job_payload(job: BroadcastJob) -> Dict[str, Any]:
+    return {
+        "id": str(job.id),
+        "title": job.title,
+        "category": job.category,
+        "target": job.target,
+        "status": job.status,
+        "total_users": job.total_users,
+        "processed_users": job.processed_users,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+async def claim_broadcast_job(claim: str) -> Optional[BroadcastJob]:
+    """Atomically take the oldest pending job, or a running one whose worker stopped heartbeating"""
+    now = datetime.now(timezone.utc)
+    return await BroadcastJob.find_one(
+        In(BroadcastJob.status, ["pending", "running"]),
+        {"$or": [
+            {"claimed_by": None},
+            {"heartbeat_at": {"$lt": now - timedelta(seconds=BROADCAST_JOB_LEASE_SECONDS)}}
+        ]}
+    ).update(
+        Set({
+            BroadcastJob.status: "running",
+            BroadcastJob.claimed_by: claim,
+            BroadcastJob.heartbeat_at: now
+        }),
+        response_type=UpdateResponse.NEW_DOCUMENT,
+        sort=[("created_at", ASCENDING)]
+    )
+
+async def run_broadcast_job(job: BroadcastJob, claim: str) -> None:
+    """Fan a broadcast out to every target user in chunks of BROADCAST_CHUNK_SIZE.
+
+    Users are walked in _id order from ``last_user_id`` and progress is saved
+    after every chunk, so a job taken over after a crash continues where the
+    previous worker stopped. Notifications of a chunk that was written but
+    not checkpointed are removed first so nobody gets the broadcast twice.
+    """
+    if job.started_at is None:
+        await job.set({BroadcastJob.started_at: datetime.now(timezone.utc)})
+    
+    leftover = Notification.find(
+        Notification.broadcast_job_id == job.id,
+        *([Notification.user_id > job.last_user_id] if job.last_user_id else [])
+    )
+    stale = await leftover.project(NotificationOwnerView).to_list()
+    if stale:
+        await leftover.delete()
+        await adjust_unread_counts({n.user_id: -1 for n in stale if not n.is_read})
+        await bump_user_versions("notifications", (n.user_id for n in stale))
+    
+    users = User.find(
+        User.role == "user",
+        *([User.id > job.last_user_id] if job.last_user_id else [])
+    ).sort(+User.id).project(IdView)
+    
+    async def flush(chunk: List[Notification]) -> bool:
+        await push_notifications(chunk)
+        result = await BroadcastJob.find_one(
+            BroadcastJob.id == job.id,
+            BroadcastJob.claimed_by == claim
+        ).update(
+            Set({
+                BroadcastJob.last_user_id: chunk[-1].user_id,
+                BroadcastJob.heartbeat_at: datetime.now(timezone.utc)
+            }),
+            Inc({BroadcastJob.processed_users: len(chunk)})
+        )
+        # Lost the lease to another worker; let it finish the job
+        return result.matched_count == 1
+    
+    chunk: List[Notification] = []
+    async for user in users:
+        chunk.append(Notification(
+            user_id=user.id,
+            title=job.title,
+            message=job.message,
+            type="announcement",
+            category=job.category,
+            broadcast_job_id=job.id
+        ))
+        if len(chunk) >= BROADCAST_CHUNK_SIZE:
+            if not await flush(chunk):
+                return
+            chunk = []
+    
+    if chunk and not await flush(chunk):
+        return
+    
+    await BroadcastJob.find_one(
+        BroadcastJob.id == job.id,
+        BroadcastJob.claimed_by == claim
+    ).update(Set({
+        BroadcastJob.status: "completed",
+        BroadcastJob.claimed_by: None,
+        BroadcastJob.finished_at: datetime.now(timezone.utc)
+    }))
+
+async def process_broadcast_jobs() -> None:
+    """Run queued broadcast jobs one after another"""
+    claim = uuid.uuid4().hex
+    while True:
+        job = await claim_broadcast_job(claim)
+        if not job:
+            return
+        logger.info("Running broadcast job %s (%d users)", job.id, job.total_users)
+        try:
+            await run_broadcast_job(job, claim)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("Broadcast job %s failed", job.id)
+            await job.set({
+                BroadcastJob.status: "failed",
+                BroadcastJob.claimed_by: None,
+                BroadcastJob.error: str(exc)
+            })
+
+# ==================== BUSINESS METRICS ====================
+
+METRICS_ENTITIES = ("orders", "payments", "support_tickets", "referrals", "users")
+
+ORDER_STATUSES = ("pending", "inactive", "paid", "active", "expired", "cancelled")
+PAYMENT_STATUSES = ("pending", "success", "failed")
+SUPPORT_TICKET_STATUSES = ("open", "in_progress", "resolved", "closed")
+SUPPORT_TICKET_SOURCES = ("manual", "ai_escalation")
+
+def metric_key(value: Any, known: Tuple[str, ...]) -> str:
+    """Counter field name for ``value``; anything outside ``known`` is counted as "other"
+
+    Keeps client-supplied strings out of $inc field paths.
+    """
+    return value if value in known else "other"
+
+def status_change(
+    before: Optional[Tuple[str, int]],
+    after: Optional[Tuple[str, int]],
+    amount_field: str,
+    known: Tuple[str, ...]
+) -> Counter:
+    """Counter deltas for a record moving from ``before`` to ``after``, each a (status, amount) pair or None"""
+    deltas: Counter = Counter()
+    for side, sign in ((before, -1), (after, 1)):
+        if side:
+            status_name, amount = side
+            key = metric_key(status_name, known)
+            deltas[f"count.{key}"] += sign
+            deltas[f"{amount_field}.{key}"] += sign * (amount or 0)
+    return deltas
+
+def order_change(before: Optional[Tuple[str, int]], after: Optional[Tuple[str, int]]) -> Counter:
+    return status_change(before, after, "revenue_cents", ORDER_STATUSES)
+
+def payment_change(before: Optional[Tuple[str, int]], after: Optional[Tuple[str, int]]) -> Counter:
+    return status_change(before, after, "amount_cents", PAYMENT_STATUSES)
+
+def ticket_change(before: Optional[str], after: Optional[str], source: Optional[str] = None) -> Counter:
+    """Counter deltas for a ticket status change; ``source`` is counted once, on creation"""
+    deltas: Counter = Counter()
+    if before is not None:
+        deltas[f"count.{metric_key(before, SUPPORT_TICKET_STATUSES)}"] -= 1
+    if after is not None:
+        deltas[f"count.{metric_key(after, SUPPORT_TICKET_STATUSES)}"] += 1
+    if source is not None:
+        deltas[f"source.{metric_key(source, SUPPORT_TICKET_SOURCES)}"] += 1
+    return deltas
+
+async def bump_metrics(changes: Dict[str, Dict[str, int]]) -> None:
+    """Apply counter deltas keyed by entity, one atomic $inc per counter document"""
+    ops = []
+    for entity, deltas in changes.items():
+        inc = {f"values.{key}": delta for key, delta in deltas.items() if delta}
+        if inc:
+            ops.append(UpdateOne({"_id": entity}, {"$inc": inc}, upsert=True))
+    if ops:
+        await MetricsCounter.get_pymongo_collection().bulk_write(ops, ordered=False)
+
+async def read_metrics(*entities: str) -> Dict[str, Dict[str, Any]]:
+    """Counter values for ``entities`` in a single primary-key read"""
+    docs = await MetricsCounter.get_pymongo_collection().find({"_id": {"$in": list(entities)}}).to_list(None)
+    values = {doc["_id"]: doc.get("values", {}) for doc in docs}
+    return {entity: values.get(entity, {}) for entity in entities}
+
+def _nonzero(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop zero leaves, which $inc leaves behind once a status empties out"""
+    cleaned = {}
+    for key, value in values.items():
+        if isinstance(value, dict):
+            value = _nonzero(value)
+        if value:
+            cleaned[key] = value
+    return cleaned
+
+async def reconcile_metrics() -> int:
+    """Rebuild the counters from $group pipelines over the source collections.
+
+    Counters only drift if a process dies between a write and its $inc, so
+    this runs rarely, on one worker at a time (see leased). The recount is a read followed by a $set, so an $inc
+    landing in between is lost or counted twice until the next run.
+    Returns the number of counter documents fixed.
+    """
+    def by_status(rows: List[Dict[str, Any]], amount_field: str, known: Tuple[str, ...]) -> Dict[str, Any]:
+        counts: Counter = Counter()
+        amounts: Counter = Counter()
+        for row in rows:
+            counts[metric_key(row["_id"], known)] += row["count"]
+            amounts[metric_key(row["_id"], known)] += row["amount"]
+        return {"count": dict(counts), amount_field: dict(amounts)}
+    
+    def fold(rows: List[Dict[str, Any]], known: Tuple[str, ...]) -> Dict[str, int]:
+        counts: Counter = Counter()
+        for row in rows:
+            counts[metric_key(row["_id"], known)] += row["n"]
+        return dict(counts)
+    
+    order_rows, payment_rows, ticket_rows, referral_rows, users_count = await asyncio.gather(
+        Order.aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}, "amount": {"$sum": "$price_cents"}}}
+        ]).to_list(),
+        Payment.aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}, "amount": {"$sum": "$amount_cents"}}}
+        ]).to_list(),
+        SupportTicket.aggregate([
+            {"$facet": {
+                "count": [{"$group": {"_id": "$status", "n": {"$sum": 1}}}],
+                "source": [{"$group": {"_id": {"$ifNull": ["$source", "manual"]}, "n": {"$sum": 1}}}]
+            }}
+        ]).to_list(),
+        Referral.aggregate([
+            {"$group": {
+                "_id": None,
+                "users": {"$sum": 1},
+                "clicks": {"$sum": "$clicks"},
+                "signups": {"$sum": "$signups"},
+                "conversions": {"$sum": "$conversions"}
+            }}
+        ]).to_list(),
+        User.count()
+    )
+    referrals = referral_rows[0] if referral_rows else {}
+    actual = {
+        "orders": by_status(order_rows, "revenue_cents", ORDER_STATUSES),
+        "payments": by_status(payment_rows, "amount_cents", PAYMENT_STATUSES),
+        "support_tickets": {
+            "count": fold(ticket_rows[0]["count"], SUPPORT_TICKET_STATUSES),
+            "source": fold(ticket_rows[0]["source"], SUPPORT_TICKET_SOURCES)
+        },
+        "referrals": {key: referrals.get(key, 0) for key in ("users", "clicks", "signups", "conversions")},
+        "users": {"total": users_count}
+    }
+    stored = await read_metrics(*METRICS_ENTITIES)
+    
+    fixes = {
+        entity: values for entity, values in actual.items()
+        if _nonzero(values) != _nonzero(stored[entity])
+    }
+    if fixes:
+        await MetricsCounter.get_pymongo_collection().bulk_write([
+            UpdateOne({"_id": entity}, {"$set": {"values": values}}, upsert=True)
+            for entity, values in fixes.items()
+        ], ordered=False)
+        logger.info("Reconciled business counters: %s", ", ".join(fixes))
+    return len(fixes)
+
+async def seed_metrics() -> int:
+    """Build the counters from scratch if any of them has never been written"""
+    present = await MetricsCounter.find(In(MetricsCounter.id, list(METRICS_ENTITIES))).count()
+    if present == len(METRICS_ENTITIES):
+        return 0
+    return await reconcile_metrics()
+
+# ==================== PAYMENT SCHEDULER ====================
+
+PAYMENT_FINAL_STATUSES = ("success", "failed")
+
+def payment_status_payload(payment: Payment, order: Order) -> Dict[str, Any]:
+    created_at = payment.created_at
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    elapsed_seconds = (datetime.now(timezone.utc) - created_at).total_seconds()
+    
+    return {
+        "payment_id": str(payment.id),
+        "order_id": str(order.id),
+        "payment_status": payment.status,
+        "order_status": order.status,
+        "elapsed_seconds": int(elapsed_seconds),
+        "expires_in_seconds": max(0, PAYMENT_TIMEOUT_SECONDS - int(elapsed_seconds))
+    }
+
+async def publish_payment_status(payment: Payment, order: Order) -> None:
+    await broker.publish(f"payment:{payment.id}", payment_status_payload(payment, order))
+
+async def schedule_unscheduled_payments() -> int:
+    """Give pending payments created before the scheduler existed a due time.
+
+    Those payments used to succeed on the first status poll after
+    PAYMENT_AUTO_SUCCESS_SECONDS; they are scheduled to settle at the same
+    moment so the scheduler picks them up. Idempotent: only payments without
+    a ``due_at`` are touched.
+    """
+    result = await Payment.get_pymongo_collection().update_many(
+        {"status": "pending", "due_at": None},
+        [{"$set": {
+            "due_at": {"$add": ["$created_at", PAYMENT_AUTO_SUCCESS_SECONDS * 1000]},
+            "due_action": "settle"
+        }}]
+    )
+    if result.modified_count:
+        logger.info("Scheduled %d pending payments that had no due time", result.modified_count)
+    return result.modified_count
+
+async def settle_due_payments() -> int:
+    """Apply due payment transitions in bulk.
+
+    Pending payments whose ``due_at`` has passed are claimed with a single
+    update_many (so concurrent workers never process the same payment), then
+    settled or expired with one update_many per status transition. Claims
+    older than a minute are considered abandoned and can be taken over.
+    
+    The business counters are bumped after the status writes, not with them:
+    a worker that dies in between leaves those transitions out of the
+    counters until the next reconcile_metrics run repairs them, so the
+    metrics are only eventually consistent.
+    """
+    now = datetime.now(timezone.utc)
+    claim = uuid.uuid4().hex
+    
+    due = await Payment.find(
+        Payment.status == "pending",
+        Payment.due_at <= now
+    ).sort(+Payment.due_at).limit(PAYMENT_SCHEDULER_BATCH_SIZE).to_list()
+    if not due:
+        return 0
+    
+    await Payment.find(
+        In(Payment.id, [p.id for p in due]),
+        Payment.status == "pending",
+        {"$or": [{"claimed_by": None}, {"claimed_at": {"$lt": now - timedelta(minutes=1)}}]}
+    ).update_many(Set({Payment.claimed_by: claim, Payment.claimed_at: now}))
+    
+    claimed = await Payment.find(In(Payment.id, [p.id for p in due]), Payment.claimed_by == claim).to_list()
+    if not claimed:
+        return 0
+    
+    # Every write re-checks the claim and the status it read: a batch that
+    # overruns the claim window may have lost payments to another worker,
+    # and an admin may have edited an order in the meantime.
+    for action, new_status in (("settle", "success"), ("expire", "failed")):
+        ids = [p.id for p in claimed if (p.due_action == "settle") == (action == "settle")]
+        if ids:
+            await Payment.find(
+                In(Payment.id, ids), Payment.claimed_by == claim, Payment.status == "pending"
+            ).update_many(Set({Payment.status: new_status}))
+    
+    done = await Payment.find(
+        In(Payment.id, [p.id for p in claimed]),
+        Payment.claimed_by == claim,
+        In(Payment.status, PAYMENT_FINAL_STATUSES)
+    ).to_list()
+    if not done:
+        return 0
+    
+    orders = {
+        o.id: o for o in await Order.find(In(Order.id, [p.order_id for p in done])).to_list()
+    }
+    # A settled payment wins over an expired one for the same order
+    order_target: Dict[PydanticObjectId, str] = {}
+    for payment in done:
+        if payment.status == "success" or payment.order_id not in order_target:
+            order_target[payment.order_id] = "active" if payment.status == "success" else "cancelled"
+    
+    expires_at = now + timedelta(days=365)
+    transitions: Dict[Tuple[str, str], List[PydanticObjectId]] = defaultdict(list)
+    for order_id, target in order_target.items():
+        if order_id in orders:
+            transitions[(orders[order_id].status, target)].append(order_id)
+    for (previous, target), ids in transitions.items():
+        changes = {Order.status: target, Order.settled_by: claim}
+        if target == "active":
+            changes[Order.expires_at] = expires_at
+        await Order.find(In(Order.id, ids), Order.status == previous).update_many(Set(changes))
+    
+    # Orders whose status moved under us were left alone by the guarded update,
+    # so only those stamped with this run's claim count as moved; one that an
+    # admin already put in the target status must not be counted twice
+    views = await Order.find(In(Order.id, list(orders))).project(OrderStatusView).to_list()
+    current = {o.id: o.status for o in views}
+    moved = {o.id for o in views if o.settled_by == claim and o.id in order_target}
+    
+    notifications = []
+    events = []
+    payment_deltas: Counter = Counter()
+    order_deltas: Counter = Counter()
+    for payment in done:
+        payment_deltas.update(payment_change(("pending", payment.amount_cents), (payment.status, payment.amount_cents)))
+        order = orders.get(payment.order_id)
+        if not order:
+            continue
+        if payment.status == "success":
+            notifications.append(Notification(
+                user_id=order.user_id,
+                title="Payment Successful",
+                message=f"Payment for {order.domain} has been completed. Your service is now active!",
+                type="billing"
+            ))
+            events.append(user_event(order.user_id, "payment_success", payment.id, now,
+                                     amount_cents=payment.amount_cents, method=payment.method))
+        else:
+            notifications.append(Notification(
+                user_id=order.user_id,
+                title="Payment Cancelled",
+                message=f"Payment for {order.domain} has been cancelled due to timeout.",
+                type="billing"
+            ))
+            events.append(user_event(order.user_id, "payment_failed", payment.id, now,
+                                     amount_cents=payment.amount_cents, method=payment.method))
+    for order_id in moved:
+        order = orders[order_id]
+        target = order_target[order_id]
+        order_deltas.update(order_change((order.status, order.price_cents), (target, order.price_cents)))
+        if target == "active":
+            events.append(user_event(order.user_id, "service_active", order.id, now,
+                                     domain=order.domain, expires_at=expires_at))
+    await bump_metrics({"payments": payment_deltas, "orders": order_deltas})
+    
+    if notifications:
+        await push_notifications(notifications)
+    await record_events(*events)
+    await bump_user_versions("services", (o.user_id for o in orders.values()))
+    
+    for payment in done:
+        order = orders.get(payment.order_id)
+        if order:
+            order.status = current.get(order.id, order.status)
+            await publish_payment_status(payment, order)
+    
+    settled = sum(1 for p in done if p.status == "success")
+    logger.info("Payment scheduler settled %d and expired %d payments", settled, len(done) - settled)
+    return len(done)
+
 # ==================== STARTUP ====================
 
 @app.on_event("startup")
 async def startup_event():
     await init_beanie(
         database=client[db_name],
-        document_models=[
-            User, Package, Order, Payment, Ticket, 
-            Announcement, Promo, Affiliate, ActivityLog, KnowledgeArticle,
-            Cart, Notification, SupportTicket, Referral, UserProfile
-        ]
+        document_models=DOCUMENT_MODELS
     )
     logger.info("Database initialized")
+    await ensure_notification_retention()
+    
+    try:
+        await verify_indexes()
+    except Exception:
+        logger.exception("Index verification failed")
+    
+    await token_versions.load()
     
     # Seed data if empty
     users_count = await User.count()
@@ -420,7 +2355,7 @@ async def startup_event():
         admin = User(
             name="Admin User",
             email="admin@hostingin.com",
-            password_hash=hash_password("admin123"),
+            password_hash=await password_hasher.hash("admin123"),
             role="admin"
         )
         await admin.insert()
@@ -429,7 +2364,7 @@ async def startup_event():
         test_user = User(
             name="Test User",
             email="test@hostingin.com",
-            password_hash=hash_password("password123"),
+            password_hash=await password_hasher.hash("password123"),
             role="user"
         )
         await test_user.insert()
@@ -547,7 +2482,7 @@ async def startup_event():
             await notif.insert()
         
         # Create referral for test user
-        referral_code = f"REF{str(test_user.id)[:8].upper()}"
+        referral_code = referral_code_for(test_user.id)
         test_referral = Referral(
             user_id=test_user.id,
             code=referral_code,
@@ -559,36 +2494,55 @@ async def startup_event():
         await test_referral.insert()
         
         logger.info("Seeding completed!")
+    
+    await package_catalog.reload()
+    run_periodically("token-version-refresh", TOKEN_VERSION_REFRESH_SECONDS, token_versions.load)
+    run_periodically("package-catalog-refresh", PACKAGE_CATALOG_REFRESH_SECONDS, package_catalog.reload)
+    await schedule_unscheduled_payments()
+    run_periodically("payment-scheduler", PAYMENT_SCHEDULER_INTERVAL_SECONDS, settle_due_payments)
+    run_periodically("broadcast-jobs", BROADCAST_JOB_POLL_SECONDS, process_broadcast_jobs)
+    await broadcast_index.reload()
+    run_periodically("broadcast-index-refresh", BROADCAST_INDEX_REFRESH_SECONDS, broadcast_index.reload)
+    # First pass right away so counters exist for notifications written before
+    # they were tracked; the lease keeps it to one worker per interval
+    reconcile_unread = leased("unread-reconcile", UNREAD_RECONCILE_INTERVAL_SECONDS, reconcile_unread_counts)
+    _background_tasks.append(asyncio.create_task(reconcile_unread(), name="unread-reconcile-initial"))
+    run_periodically("unread-reconcile", UNREAD_RECONCILE_INTERVAL_SECONDS, reconcile_unread)
+    run_periodically("notification-compaction", NOTIFICATION_COMPACTION_INTERVAL_SECONDS, compact_notifications)
+    _background_tasks.append(asyncio.create_task(seed_metrics(), name="metrics-seed"))
+    run_periodically("metrics-reconcile", METRICS_RECONCILE_INTERVAL_SECONDS,
+                     leased("metrics-reconcile", METRICS_RECONCILE_INTERVAL_SECONDS, reconcile_metrics))
+    await broker.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in _background_tasks:
+        task.cancel()
+    await broker.stop()
     client.close()
+    password_hasher.shutdown()
 
 # ==================== AUTH ROUTES ====================
 
 @api_router.post("/auth/register")
 async def register(user_data: UserRegister):
-    # Check if user exists
-    existing = await User.find_one(User.email == user_data.email)
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Create user
+    # Create user (the unique email index rejects duplicates)
     user = User(
         name=user_data.name,
         email=user_data.email,
-        password_hash=hash_password(user_data.password),
+        password_hash=await password_hasher.hash(user_data.password),
         role="user"
     )
-    await user.insert()
+    try:
+        await user.insert()
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Auto-create referral code for new user
-    referral_code = f"REF{str(user.id)[:8].upper()}"
     referral = Referral(
         user_id=user.id,
-        code=referral_code
+        code=referral_code_for(user.id)
     )
-    await referral.insert()
     
     # Create welcome notification
     welcome_notification = Notification(
@@ -599,10 +2553,28 @@ async def register(user_data: UserRegister):
         category="system",
         is_read=False
     )
-    await welcome_notification.insert()
+    
+    # Side documents live in different collections, so write them concurrently
+    results = await asyncio.gather(
+        referral.insert(),
+        push_notification(welcome_notification),
+        bump_metrics({"users": {"total": 1}, "referrals": {"users": 1}}),
+        return_exceptions=True
+    )
+    failure = next((r for r in results if isinstance(r, BaseException)), None)
+    if failure is not None:
+        # Don't leave a half-registered user behind: the email must stay free
+        # for a retry. Counters bumped meanwhile heal at the next reconcile.
+        await asyncio.gather(
+            user.delete(),
+            Referral.find(Referral.user_id == user.id).delete(),
+            Notification.find(Notification.user_id == user.id).delete(),
+            return_exceptions=True
+        )
+        raise failure
     
     # Generate token
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_user_token(user)
     
     return {
         "access_token": access_token,
@@ -618,13 +2590,13 @@ async def register(user_data: UserRegister):
 @api_router.post("/auth/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = await User.find_one(User.email == form_data.username)
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user or not await password_hasher.verify(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_user_token(user)
     
     return {
         "access_token": access_token,
@@ -638,8 +2610,19 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         }
     }
 
+@api_router.post("/auth/stream-token")
+async def create_stream_token(token: str = Depends(oauth2_scheme)):
+    """Issue a short-lived token for EventSource URLs, which cannot carry an Authorization header"""
+    payload = await decode_access_token(token)
+    user = await user_from_token(payload)
+    stream_token = create_access_token(
+        {"sub": user.email, "uid": str(user.id), "ver": payload.get("ver", 0), "scope": "stream"},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_TTL_SECONDS)
+    )
+    return {"token": stream_token, "expires_in": STREAM_TOKEN_TTL_SECONDS}
+
 @api_router.get("/auth/me")
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: AuthUser = Depends(get_current_user)):
     return {
         "id": str(current_user.id),
         "name": current_user.name,
@@ -650,35 +2633,34 @@ async def get_me(current_user: User = Depends(get_current_user)):
     }
 
 @api_router.patch("/auth/settings")
-async def update_settings(settings: Dict[str, Any], current_user: User = Depends(get_current_user)):
-    current_user.settings.update(settings)
-    await current_user.save()
-    return {"message": "Settings updated", "settings": current_user.settings}
+async def update_settings(settings: Dict[str, Any], current_user: AuthUser = Depends(get_current_user)):
+    # current_user may be a cached copy, so merge server-side instead of saving it back whole
+    updated = await User.get_pymongo_collection().find_one_and_update(
+        {"_id": current_user.id},
+        [{"$set": {"settings": {"$mergeObjects": [{"$ifNull": ["$settings", {}]}, {"$literal": settings}]}}}],
+        projection={"settings": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    auth_cache.invalidate(current_user.email)
+    if not updated:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"message": "Settings updated", "settings": updated["settings"]}
 
 # ==================== PACKAGE ROUTES ====================
 
 @api_router.get("/packages")
-async def get_packages():
-    packages = await Package.find_all().to_list()
-    return [
-        {
-            "id": str(pkg.id),
-            "slug": pkg.slug,
-            "title": pkg.title,
-            "price_cents": pkg.price_cents,
-            "features": pkg.features,
-            "storage_mb": pkg.storage_mb,
-            "bandwidth_gb": pkg.bandwidth_gb,
-            "description": pkg.description,
-            "created_at": pkg.created_at.isoformat()
-        }
-        for pkg in packages
-    ]
+async def get_packages(request: Request):
+    etag = package_catalog.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=package_catalog.body, media_type="application/json", headers=headers)
 
 @api_router.post("/packages", dependencies=[Depends(get_admin_user)])
 async def create_package(package_data: PackageCreate):
     package = Package(**package_data.dict())
     await package.insert()
+    await package_catalog.reload()
     return {"message": "Package created", "id": str(package.id)}
 
 @api_router.patch("/packages/{package_id}", dependencies=[Depends(get_admin_user)])
@@ -690,6 +2672,7 @@ async def update_package(package_id: str, package_data: Dict[str, Any]):
     for key, value in package_data.items():
         setattr(package, key, value)
     await package.save()
+    await package_catalog.reload()
     
     return {"message": "Package updated"}
 
@@ -700,26 +2683,25 @@ async def delete_package(package_id: str):
         raise HTTPException(status_code=404, detail="Package not found")
     
     await package.delete()
+    await package_catalog.reload()
     return {"message": "Package deleted"}
 
 # ==================== ORDER ROUTES ====================
 
 @api_router.post("/orders")
-async def create_order(order_data: OrderCreate, current_user: User = Depends(get_current_user)):
-    package = await Package.get(order_data.package_id)
+async def create_order(order_data: OrderCreate, current_user: AuthUser = Depends(get_current_user)):
+    # Fall back to the database: the package may be newer than this worker's catalog
+    package = (await resolve_packages([order_data.package_id])).get(str(order_data.package_id))
     if not package:
         raise HTTPException(status_code=404, detail="Package not found")
     
     price = package.price_cents * order_data.period_months
     
     # Apply promo code if provided
-    if order_data.promo_code:
-        promo = await Promo.find_one(Promo.code == order_data.promo_code)
-        if promo and promo.expires_at > datetime.now(timezone.utc) and promo.usage_count < promo.usage_limit:
-            discount = int(price * promo.discount_percent / 100)
-            price -= discount
-            promo.usage_count += 1
-            await promo.save()
+    promo = await redeem_promo(order_data.promo_code) if order_data.promo_code else None
+    if promo:
+        discount = int(price * promo.discount_percent / 100)
+        price -= discount
     
     order = Order(
         user_id=current_user.id,
@@ -730,7 +2712,15 @@ async def create_order(order_data: OrderCreate, current_user: User = Depends(get
         status="pending",
         promo_code=order_data.promo_code
     )
-    await order.insert()
+    try:
+        await order.insert()
+    except Exception:
+        if promo:
+            await release_promo(promo.code)
+        raise
+    await bump_user_versions("services", [current_user.id])
+    await bump_metrics({"orders": order_change(None, (order.status, order.price_cents))})
+    await record_events(order_created_event(order))
     
     # Create notification for order creation
     notification = Notification(
@@ -741,7 +2731,7 @@ async def create_order(order_data: OrderCreate, current_user: User = Depends(get
         category="system",
         is_read=False
     )
-    await notification.insert()
+    await push_notification(notification)
     
     return {
         "message": "Order created",
@@ -754,16 +2744,21 @@ async def create_order(order_data: OrderCreate, current_user: User = Depends(get
     }
 
 @api_router.get("/orders")
-async def get_orders(status: Optional[str] = None, current_user: User = Depends(get_current_user)):
-    query = Order.find(Order.user_id == current_user.id)
+async def get_orders(
+    status: Optional[str] = None,
+    page: PageParams = Depends(),
+    current_user: AuthUser = Depends(get_current_user)
+):
+    filters: Dict[str, Any] = {"user_id": current_user.id}
     if status:
-        query = query.find(Order.status == status)
+        filters["status"] = status
     
-    orders = await query.to_list()
+    orders, next_cursor = await paginate(Order, filters, page)
+    packages = await resolve_packages({order.package_id for order in orders})
     result = []
     
     for order in orders:
-        package = await Package.get(order.package_id)
+        package = packages.get(str(order.package_id))
         result.append({
             "id": str(order.id),
             "domain": order.domain,
@@ -775,15 +2770,45 @@ async def get_orders(status: Optional[str] = None, current_user: User = Depends(
             "expires_at": order.expires_at.isoformat() if order.expires_at else None
         })
     
-    return result
+    return {"items": result, "next_cursor": next_cursor}
+
+@api_router.get("/orders/summary")
+async def get_orders_summary(current_user: AuthUser = Depends(get_current_user)):
+    """Totals over all of the user's orders and their payments, for the dashboard cards"""
+    facets = await Order.aggregate([
+        {"$match": {"user_id": current_user.id}},
+        {"$facet": {
+            "orders": [
+                {"$group": {"_id": "$status", "count": {"$sum": 1}, "amount_cents": {"$sum": "$price_cents"}}}
+            ],
+            "payments": [
+                {"$lookup": {
+                    "from": Payment.get_collection_name(),
+                    "localField": "_id",
+                    "foreignField": "order_id",
+                    "as": "payment"
+                }},
+                {"$unwind": "$payment"},
+                {"$group": {"_id": "$payment.status", "count": {"$sum": 1}}}
+            ]
+        }}
+    ]).to_list()
+    orders = facets[0]["orders"]
+    
+    return {
+        "total_orders": sum(row["count"] for row in orders),
+        "orders_by_status": {row["_id"]: row["count"] for row in orders},
+        "spent_cents_by_status": {row["_id"]: row["amount_cents"] for row in orders},
+        "payments_by_status": {row["_id"]: row["count"] for row in facets[0]["payments"]}
+    }
 
 @api_router.get("/orders/{order_id}")
-async def get_order(order_id: str, current_user: User = Depends(get_current_user)):
+async def get_order(order_id: str, current_user: AuthUser = Depends(get_current_user)):
     order = await Order.get(order_id)
     if not order or order.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    package = await Package.get(order.package_id)
+    package = (await resolve_packages([order.package_id])).get(str(order.package_id))
     payments = await Payment.find(Payment.order_id == order.id).to_list()
     
     return {
@@ -792,7 +2817,7 @@ async def get_order(order_id: str, current_user: User = Depends(get_current_user
         "package": {
             "id": str(package.id),
             "title": package.title,
-            "features": package.features
+            "features": list(package.features)
         } if package else None,
         "period_months": order.period_months,
         "price_cents": order.price_cents,
@@ -812,7 +2837,7 @@ async def get_order(order_id: str, current_user: User = Depends(get_current_user
     }
 
 @api_router.post("/orders/{order_id}/pay")
-async def pay_order(order_id: str, payment_data: PaymentSimulate, current_user: User = Depends(get_current_user)):
+async def pay_order(order_id: str, payment_data: PaymentSimulate, current_user: AuthUser = Depends(get_current_user)):
     order = await Order.get(order_id)
     if not order or order.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -825,6 +2850,7 @@ async def pay_order(order_id: str, payment_data: PaymentSimulate, current_user:
         status="pending"
     )
     await payment.insert()
+    previous_status = order.status
     
     # Simulate payment
     if payment_data.outcome == "success":
@@ -841,7 +2867,7 @@ async def pay_order(order_id: str, payment_data: PaymentSimulate, current_user:
             category="payment",
             is_read=False
         )
-        await notification.insert()
+        await push_notification(notification)
     else:
         payment.status = "failed"
         
@@ -854,10 +2880,20 @@ async def pay_order(order_id: str, payment_data: PaymentSimulate, current_user:
             category="payment",
             is_read=False
         )
-        await notification.insert()
+        await push_notification(notification)
     
     await payment.save()
     await order.save()
+    await bump_user_versions("services", [order.user_id])
+    await bump_metrics({
+        "payments": payment_change(None, (payment.status, payment.amount_cents)),
+        "orders": order_change((previous_status, order.price_cents), (order.status, order.price_cents))
+    })
+    await record_events(user_event(
+        order.user_id, f"payment_{payment.status}", payment.id,
+        amount_cents=payment.amount_cents, method=payment.method
+    ))
+    await publish_payment_status(payment, order)
     
     return {
         "message": f"Payment {payment.status}",
@@ -872,13 +2908,15 @@ async def pay_order(order_id: str, payment_data: PaymentSimulate, current_user:
     }
 
 @api_router.post("/orders/{order_id}/renew")
-async def renew_order(order_id: str, current_user: User = Depends(get_current_user)):
+async def renew_order(order_id: str, current_user: AuthUser = Depends(get_current_user)):
     order = await Order.get(order_id)
     if not order or order.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Order not found")
     
     # Create new order with same details
-    package = await Package.get(order.package_id)
+    package = (await resolve_packages([order.package_id])).get(str(order.package_id))
+    if not package:
+        raise HTTPException(status_code=404, detail="Package not found")
     new_order = Order(
         user_id=current_user.id,
         package_id=order.package_id,
@@ -888,6 +2926,9 @@ async def renew_order(order_id: str, current_user: User = Depends(get_current_us
         status="pending"
     )
     await new_order.insert()
+    await bump_user_versions("services", [current_user.id])
+    await bump_metrics({"orders": order_change(None, (new_order.status, new_order.price_cents))})
+    await record_events(order_created_event(new_order))
     
     return {
         "message": "Order renewed",
@@ -897,7 +2938,7 @@ async def renew_order(order_id: str, current_user: User = Depends(get_current_us
 # ==================== PAYMENT ROUTES ====================
 
 @api_router.get("/payments/{order_id}")
-async def get_payments(order_id: str, current_user: User = Depends(get_current_user)):
+async def get_payments(order_id: str, current_user: AuthUser = Depends(get_current_user)):
     order = await Order.get(order_id)
     if not order or order.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -918,7 +2959,7 @@ async def get_payments(order_id: str, current_user: User = Depends(get_current_u
 # ==================== TICKET ROUTES ====================
 
 @api_router.post("/tickets")
-async def create_ticket(ticket_data: TicketCreate, current_user: User = Depends(get_current_user)):
+async def create_ticket(ticket_data: TicketCreate, current_user: AuthUser = Depends(get_current_user)):
     ticket = Ticket(
         user_id=current_user.id,
         subject=ticket_data.subject,
@@ -933,55 +2974,159 @@ async def create_ticket(ticket_data: TicketCreate, current_user: User = Depends(
     }
 
 @api_router.get("/tickets")
-async def get_tickets(current_user: User = Depends(get_current_user)):
-    if current_user.role == "admin":
-        tickets = await Ticket.find_all().to_list()
-    else:
-        tickets = await Ticket.find(Ticket.user_id == current_user.id).to_list()
+async def get_tickets(page: PageParams = Depends(), current_user: AuthUser = Depends(get_current_user)):
+    filters = {} if current_user.role == "admin" else {"user_id": current_user.id}
+    tickets, next_cursor = await paginate(Ticket, filters, page)
     
-    return [
-        {
-            "id": str(t.id),
-            "subject": t.subject,
-            "message": t.message,
-            "status": t.status,
-            "created_at": t.created_at.isoformat(),
-            "replies_count": len(t.replies)
-        }
-        for t in tickets
-    ]
+    return {
+        "items": [
+            {
+                "id": str(t.id),
+                "subject": t.subject,
+                "message": t.message,
+                "status": t.status,
+                "created_at": t.created_at.isoformat(),
+                "replies_count": len(t.replies)
+            }
+            for t in tickets
+        ],
+        "next_cursor": next_cursor
+    }
+
+@api_router.get("/tickets/summary")
+async def get_tickets_summary(current_user: AuthUser = Depends(get_current_user)):
+    """Ticket counts per status over every ticket the caller can see"""
+    filters = {} if current_user.role == "admin" else {"user_id": current_user.id}
+    rows = await Ticket.aggregate([
+        {"$match": filters},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list()
+    
+    return {
+        "total": sum(row["count"] for row in rows),
+        "by_status": {row["_id"]: row["count"] for row in rows}
+    }
 
 # ==================== ADMIN ROUTES ====================
 
+ADMIN_ORDER_SORT_FIELDS = {"created_at", "price_cents"}
+ADMIN_ORDER_EDITABLE_FIELDS = {"status", "expires_at", "domain"}
+
 @api_router.get("/admin/orders")
-async def admin_get_orders(admin: User = Depends(get_admin_user)):
-    orders = await Order.find_all().to_list()
-    result = []
-    
-    for order in orders:
-        user = await User.get(order.user_id)
-        package = await Package.get(order.package_id)
-        result.append({
-            "id": str(order.id),
-            "user_email": user.email if user else "Unknown",
-            "domain": order.domain,
+async def admin_get_orders(
+    page: PageParams = Depends(),
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    user_email: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    sort_by: str = "created_at",
+    order: str = "desc",
+    admin: TokenUser = Depends(get_admin_user)
+):
+    """Admin: List orders with filters and keyset pagination"""
+    if sort_by not in ADMIN_ORDER_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {sorted(ADMIN_ORDER_SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    descending = order == "desc"
+    
+    match: Dict[str, Any] = {}
+    if status:
+        match["status"] = status
+    if user_email:
+        user = await User.find_one(User.email == user_email)
+        if not user:
+            return {"items": [], "next_cursor": None}
+        match["user_id"] = user.id
+    elif user_id:
+        try:
+            match["user_id"] = PydanticObjectId(user_id)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid user_id")
+    if date_from or date_to:
+        match["created_at"] = {}
+        if date_from:
+            match["created_at"]["$gte"] = date_from
+        if date_to:
+            match["created_at"]["$lt"] = date_to
+    page_filter = keyset_filter(sort_by, page.cursor, descending)
+    if page_filter:
+        match = {"$and": [match, page_filter]} if match else page_filter
+    
+    direction = -1 if descending else 1
+    pipeline = [
+        {"$match": match},
+        {"$sort": {sort_by: direction, "_id": direction}},
+        {"$limit": page.limit + 1},
+        {"$lookup": {
+            "from": User.get_collection_name(),
+            "localField": "user_id",
+            "foreignField": "_id",
+            "as": "user"
+        }},
+        {"$project": {
+            "package_id": 1,
+            "domain": 1,
+            "price_cents": 1,
+            "status": 1,
+            "created_at": 1,
+            "user_email": {"$arrayElemAt": ["$user.email", 0]}
+        }}
+    ]
+    rows = await Order.aggregate(pipeline).to_list()
+    
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(sort_by, rows[-1][sort_by], rows[-1]["_id"])
+    
+    packages = await resolve_packages(row.get("package_id") for row in rows)
+    items = []
+    for row in rows:
+        package = packages.get(str(row.get("package_id")))
+        items.append({
+            "id": str(row["_id"]),
+            "user_email": row.get("user_email") or "Unknown",
+            "domain": row["domain"],
             "package_name": package.title if package else "Unknown",
-            "price_cents": order.price_cents,
-            "status": order.status,
-            "created_at": order.created_at.isoformat()
+            "price_cents": row["price_cents"],
+            "status": row["status"],
+            "created_at": row["created_at"].isoformat()
         })
     
-    return result
+    return {"items": items, "next_cursor": next_cursor}
 
 @api_router.patch("/admin/orders/{order_id}")
-async def admin_update_order(order_id: str, data: Dict[str, Any], admin: User = Depends(get_admin_user)):
+async def admin_update_order(order_id: str, data: Dict[str, Any], admin: TokenUser = Depends(get_admin_user)):
+    # Anything else (price_cents, user_id, ...) would silently skew the
+    # revenue counters fed by order_change below
+    unknown = set(data) - ADMIN_ORDER_EDITABLE_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot update order fields: {', '.join(sorted(unknown))}")
+    if "status" in data and data["status"] not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid order status")
+    if "domain" in data and (not isinstance(data["domain"], str) or not data["domain"].strip()):
+        raise HTTPException(status_code=400, detail="Invalid domain")
+    if data.get("expires_at") is not None:
+        try:
+            data["expires_at"] = datetime.fromisoformat(data["expires_at"])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid expires_at")
+    
     order = await Order.get(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    before = (order.status, order.price_cents)
     for key, value in data.items():
         setattr(order, key, value)
     await order.save()
+    await bump_user_versions("services", [order.user_id])
+    await bump_metrics({"orders": order_change(before, (order.status, order.price_cents))})
+    if order.status == "active" and order.expires_at:
+        await record_events(user_event(order.user_id, "service_active", order.id,
+                                       domain=order.domain, expires_at=order.expires_at))
     
     # Log activity
     log = ActivityLog(
@@ -993,59 +3138,105 @@ async def admin_update_order(order_id: str, data: Dict[str, Any], admin: User =
     
     return {"message": "Order updated"}
 
+REVENUE_ORDER_STATUSES = ("paid", "active")
+
 @api_router.get("/admin/stats")
-async def admin_get_stats(admin: User = Depends(get_admin_user)):
-    # Calculate stats
-    all_orders = await Order.find_all().to_list()
-    paid_orders = [o for o in all_orders if o.status in ["paid", "active"]]
-    total_revenue = sum(o.price_cents for o in paid_orders)
-    
-    users_count = await User.count()
-    active_orders = len([o for o in all_orders if o.status == "active"])
+async def admin_get_stats(admin: TokenUser = Depends(get_admin_user)):
+    # Totals come from the maintained counters; the 10 newest orders walk the
+    # (created_at, _id) index and stop after ten, so neither grows with the data.
+    metrics, recent = await asyncio.gather(
+        read_metrics("orders", "users"),
+        Order.aggregate([
+            {"$sort": {"created_at": -1, "_id": -1}},
+            {"$limit": 10},
+            {"$lookup": {
+                "from": User.get_collection_name(),
+                "localField": "user_id",
+                "foreignField": "_id",
+                "as": "user"
+            }},
+            {"$project": {
+                "package_id": 1,
+                "price_cents": 1,
+                "status": 1,
+                "created_at": 1,
+                "user_email": {"$arrayElemAt": ["$user.email", 0]}
+            }}
+        ]).to_list()
+    )
+    orders_by_status = {name: n for name, n in metrics["orders"].get("count", {}).items() if n}
+    revenue_by_status = metrics["orders"].get("revenue_cents", {})
     
-    # Recent orders
-    recent = sorted(all_orders, key=lambda x: x.created_at, reverse=True)[:10]
+    packages = await resolve_packages(order.get("package_id") for order in recent)
     recent_orders = []
     for order in recent:
-        user = await User.get(order.user_id)
-        package = await Package.get(order.package_id)
+        package = packages.get(str(order.get("package_id")))
         recent_orders.append({
-            "id": str(order.id),
-            "user_email": user.email if user else "Unknown",
+            "id": str(order["_id"]),
+            "user_email": order.get("user_email") or "Unknown",
             "package_name": package.title if package else "Unknown",
-            "price_cents": order.price_cents,
-            "status": order.status,
-            "created_at": order.created_at.isoformat()
+            "price_cents": order["price_cents"],
+            "status": order["status"],
+            "created_at": order["created_at"].isoformat()
         })
     
     return {
-        "total_revenue_cents": total_revenue,
-        "total_orders": len(all_orders),
-        "total_users": users_count,
-        "active_orders": active_orders,
+        "total_revenue_cents": sum(revenue_by_status.get(s, 0) for s in REVENUE_ORDER_STATUSES),
+        "total_orders": sum(orders_by_status.values()),
+        "total_users": metrics["users"].get("total", 0),
+        "active_orders": orders_by_status.get("active", 0),
+        "orders_by_status": orders_by_status,
         "recent_orders": recent_orders
     }
 
 @api_router.post("/admin/announce")
-async def admin_announce(announcement_data: AnnouncementCreate, admin: User = Depends(get_admin_user)):
+async def admin_announce(announcement_data: AnnouncementCreate, admin: TokenUser = Depends(get_admin_user)):
     announcement = Announcement(**announcement_data.dict())
     await announcement.insert()
     
     return {"message": "Announcement created", "id": str(announcement.id)}
 
+@api_router.post("/admin/promos")
+async def admin_create_promo(promo_data: PromoCreate, admin: TokenUser = Depends(get_admin_user)):
+    promo = Promo(**promo_data.dict())
+    try:
+        await promo.insert()
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Promo code already exists")
+    
+    return {"message": "Promo created", "id": str(promo.id)}
+
+@api_router.get("/admin/promos/{code}")
+async def admin_get_promo(code: str, admin: TokenUser = Depends(get_admin_user)):
+    promo = await Promo.find_one(Promo.code == code)
+    if not promo:
+        raise HTTPException(status_code=404, detail="Promo not found")
+    
+    return {
+        "id": str(promo.id),
+        "code": promo.code,
+        "discount_percent": promo.discount_percent,
+        "expires_at": promo.expires_at.isoformat(),
+        "usage_limit": promo.usage_limit,
+        "usage_count": promo.usage_count
+    }
+
 @api_router.get("/admin/logs")
-async def admin_get_logs(admin: User = Depends(get_admin_user)):
-    logs = await ActivityLog.find_all().sort(-ActivityLog.created_at).to_list(100)
+async def admin_get_logs(page: PageParams = Depends(), admin: TokenUser = Depends(get_admin_user)):
+    logs, next_cursor = await paginate(ActivityLog, {}, page)
     
-    return [
-        {
-            "id": str(log.id),
-            "action": log.action,
-            "meta": log.meta,
-            "created_at": log.created_at.isoformat()
-        }
-        for log in logs
-    ]
+    return {
+        "items": [
+            {
+                "id": str(log.id),
+                "action": log.action,
+                "meta": log.meta,
+                "created_at": log.created_at.isoformat()
+            }
+            for log in logs
+        ],
+        "next_cursor": next_cursor
+    }
 
 # ==================== UTILITY ROUTES ====================
 
@@ -1086,18 +3277,21 @@ async def ai_help(q: str):
     return response
 
 @api_router.get("/kb")
-async def get_kb_articles():
-    articles = await KnowledgeArticle.find_all().to_list()
-    return [
-        {
-            "id": str(a.id),
-            "title": a.title,
-            "content": a.content,
-            "category": a.category,
-            "created_at": a.created_at.isoformat()
-        }
-        for a in articles
-    ]
+async def get_kb_articles(page: PageParams = Depends()):
+    articles, next_cursor = await paginate(KnowledgeArticle, {}, page, descending=False)
+    return {
+        "items": [
+            {
+                "id": str(a.id),
+                "title": a.title,
+                "content": a.content,
+                "category": a.category,
+                "created_at": a.created_at.isoformat()
+            }
+            for a in articles
+        ],
+        "next_cursor": next_cursor
+    }
 
 @api_router.get("/announcements")
 async def get_announcements():
@@ -1115,8 +3309,13 @@ async def get_announcements():
 # ==================== CART ROUTES ====================
 
 @api_router.get("/cart")
-async def get_cart(current_user: User = Depends(get_current_user)):
+async def get_cart(request: Request, response: Response, current_user: AuthUser = Depends(get_current_user)):
     """Get user's cart"""
+    etag = await user_etag(current_user.id, "cart")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     cart = await Cart.find_one(Cart.user_id == current_user.id, Cart.status == "open")
     
     if not cart:
@@ -1132,7 +3331,7 @@ async def get_cart(current_user: User = Depends(get_current_user)):
     }
 
 @api_router.post("/cart/add")
-async def add_to_cart(item: Dict[str, Any], current_user: User = Depends(get_current_user)):
+async def add_to_cart(item: Dict[str, Any], current_user: AuthUser = Depends(get_current_user)):
     """Add item to cart (domain, hosting, or addon)"""
     cart = await Cart.find_one(Cart.user_id == current_user.id, Cart.status == "open")
     
@@ -1148,6 +3347,7 @@ async def add_to_cart(item: Dict[str, Any], current_user: User = Depends(get_cur
     cart.updated_at = datetime.now(timezone.utc)
     
     await cart.save()
+    await bump_user_versions("cart", [current_user.id])
     
     return {
         "id": str(cart.id),
@@ -1157,7 +3357,7 @@ async def add_to_cart(item: Dict[str, Any], current_user: User = Depends(get_cur
     }
 
 @api_router.delete("/cart/remove/{item_index}")
-async def remove_from_cart(item_index: int, current_user: User = Depends(get_current_user)):
+async def remove_from_cart(item_index: int, current_user: AuthUser = Depends(get_current_user)):
     """Remove item from cart by index"""
     cart = await Cart.find_one(Cart.user_id == current_user.id, Cart.status == "open")
     
@@ -1172,6 +3372,7 @@ async def remove_from_cart(item_index: int, current_user: User = Depends(get_cur
     cart.updated_at = datetime.now(timezone.utc)
     
     await cart.save()
+    await bump_user_versions("cart", [current_user.id])
     
     return {
         "message": f"{removed_item.get('name', 'Item')} removed from cart",
@@ -1180,7 +3381,7 @@ async def remove_from_cart(item_index: int, current_user: User = Depends(get_cur
     }
 
 @api_router.delete("/cart/clear")
-async def clear_cart(current_user: User = Depends(get_current_user)):
+async def clear_cart(current_user: AuthUser = Depends(get_current_user)):
     """Clear all items from cart"""
     cart = await Cart.find_one(Cart.user_id == current_user.id, Cart.status == "open")
     
@@ -1189,14 +3390,20 @@ async def clear_cart(current_user: User = Depends(get_current_user)):
         cart.total_cents = 0
         cart.updated_at = datetime.now(timezone.utc)
         await cart.save()
+        await bump_user_versions("cart", [current_user.id])
     
     return {"message": "Cart cleared"}
 
 # ==================== CHECKOUT & PAYMENT ROUTES ====================
 
 @api_router.post("/checkout")
-async def checkout(payment_method: Dict[str, str], current_user: User = Depends(get_current_user)):
-    """Checkout cart and create order with payment"""
+async def checkout(payment_method: Dict[str, str], current_user: AuthUser = Depends(get_current_user)):
+    """Checkout cart and create order with payment.
+
+    The payment must be confirmed through ``/payment/{id}/simulate`` within
+    PAYMENT_TIMEOUT_SECONDS; otherwise the scheduler expires it and the
+    order is cancelled.
+    """
     cart = await Cart.find_one(Cart.user_id == current_user.id, Cart.status == "open")
     
     if not cart or len(cart.items) == 0:
@@ -1242,11 +3449,23 @@ async def checkout(payment_method: Dict[str, str], current_user: User = Depends(
             "created_at": datetime.now(timezone.utc).isoformat()
         }
     )
+    # Unpaid checkouts are cancelled by the payment scheduler after the timeout
+    payment.due_at = payment.created_at + timedelta(seconds=PAYMENT_TIMEOUT_SECONDS)
+    payment.due_action = "expire"
     await payment.insert()
     
     # Mark cart as checked out
     cart.status = "checked_out"
     await cart.save()
+    await bump_metrics({
+        "orders": order_change(None, (order.status, order.price_cents)),
+        "payments": payment_change(None, (payment.status, payment.amount_cents))
+    })
+    await record_events(order_created_event(order))
+    await asyncio.gather(
+        bump_user_versions("cart", [current_user.id]),
+        bump_user_versions("services", [current_user.id])
+    )
     
     # Create notification
     notification = Notification(
@@ -1255,7 +3474,7 @@ async def checkout(payment_method: Dict[str, str], current_user: User = Depends(
         message=f"Order for {domain} has been created. Please complete payment.",
         type="order"
     )
-    await notification.insert()
+    await push_notification(notification)
     
     # Generate payment reference based on method
     payment_reference = None
@@ -1273,11 +3492,15 @@ async def checkout(payment_method: Dict[str, str], current_user: User = Depends(
         "method": payment_method.get("method"),
         "payment_reference": payment_reference,
         "status": "pending",
-        "expires_in_seconds": 900  # 15 minutes
+        "expires_in_seconds": PAYMENT_TIMEOUT_SECONDS,
+        "message": (
+            f"Complete payment within {PAYMENT_TIMEOUT_SECONDS // 60} minutes. "
+            "Unpaid orders are cancelled when the payment expires."
+        )
     }
 
 @api_router.post("/payment/{payment_id}/simulate")
-async def simulate_payment(payment_id: str, current_user: User = Depends(get_current_user)):
+async def simulate_payment(payment_id: str, current_user: AuthUser = Depends(get_current_user)):
     """Start payment simulation - will auto-succeed after 3 minutes"""
     try:
         payment = await Payment.get(payment_id)
@@ -1294,11 +3517,20 @@ async def simulate_payment(payment_id: str, current_user: User = Depends(get_cur
         raise HTTPException(status_code=403, detail="Unauthorized")
     
     # Update order status to pending (waiting for payment)
+    previous_status = order.status
     order.status = "pending"
     await order.save()
+    await bump_user_versions("services", [order.user_id])
+    await bump_metrics({"orders": order_change((previous_status, order.price_cents), (order.status, order.price_cents))})
     
-    # Payment status will be updated by background job after 3 minutes
-    # For now, return pending status
+    # Hand the payment to the scheduler, which confirms it 3 minutes after creation
+    if payment.status == "pending":
+        await Payment.find_one(Payment.id == payment.id, Payment.status == "pending").update(
+            Set({
+                Payment.due_at: payment.created_at + timedelta(seconds=PAYMENT_AUTO_SUCCESS_SECONDS),
+                Payment.due_action: "settle"
+            })
+        )
     
     return {
         "payment_id": str(payment.id),
@@ -1308,7 +3540,7 @@ async def simulate_payment(payment_id: str, current_user: User = Depends(get_cur
     }
 
 @api_router.get("/payment/{payment_id}/status")
-async def get_payment_status(payment_id: str, current_user: User = Depends(get_current_user)):
+async def get_payment_status(payment_id: str, current_user: AuthUser = Depends(get_current_user)):
     """Check payment status"""
     try:
         payment = await Payment.get(payment_id)
@@ -1324,71 +3556,86 @@ async def get_payment_status(payment_id: str, current_user: User = Depends(get_c
     if not order or order.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Unauthorized")
     
-    # Auto-update payment status based on time (simulation)
-    created_at = payment.created_at
-    if created_at.tzinfo is None:
-        created_at = created_at.replace(tzinfo=timezone.utc)
-    now = datetime.now(timezone.utc)
-    elapsed_seconds = (now - created_at).total_seconds()
+    # Transitions are applied by the payment scheduler; this is a pure read
+    return payment_status_payload(payment, order)
+
+@api_router.get("/payment/{payment_id}/events")
+async def payment_events(payment_id: str, request: Request, current_user: AuthUser = Depends(get_stream_user)):
+    """Stream payment status changes as server-sent events"""
+    try:
+        payment = await Payment.get(payment_id)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Payment not found")
     
-    if payment.status == "pending":
-        if elapsed_seconds >= 180:  # 3 minutes
-            # Auto success
-            payment.status = "success"
-            await payment.save()
-            
-            order.status = "paid"
-            order.expires_at = now + timedelta(days=365)  # 1 year from now
-            await order.save()
-            
-            # Create notification
-            notification = Notification(
-                user_id=current_user.id,
-                title="Payment Successful",
-                message=f"Payment for {order.domain} has been completed. Your service is now active!",
-                type="billing"
-            )
-            await notification.insert()
-            
-            # Update order to active after payment
-            order.status = "active"
-            await order.save()
-            
-        elif elapsed_seconds >= 900:  # 15 minutes
-            # Auto cancel
-            payment.status = "failed"
-            await payment.save()
-            
-            order.status = "cancelled"
-            await order.save()
-            
-            notification = Notification(
-                user_id=current_user.id,
-                title="Payment Cancelled",
-                message=f"Payment for {order.domain} has been cancelled due to timeout.",
-                type="billing"
-            )
-            await notification.insert()
+    if not payment:
+        raise HTTPException(status_code=404, detail="Payment not found")
     
-    return {
-        "payment_id": str(payment.id),
-        "order_id": str(order.id),
-        "payment_status": payment.status,
-        "order_status": order.status,
-        "elapsed_seconds": int(elapsed_seconds),
-        "expires_in_seconds": max(0, 900 - int(elapsed_seconds))
-    }
+    order = await Order.get(payment.order_id)
+    
+    if not order or order.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    
+    channel = f"payment:{payment.id}"
+    
+    async def stream():
+        # Subscribe before sending the snapshot so no transition can slip in between
+        queue = broker.subscribe(channel)
+        try:
+            current = payment_status_payload(payment, order)
+            yield sse_event("status", current)
+            last_check = time.monotonic()
+            
+            while current["payment_status"] not in PAYMENT_FINAL_STATUSES:
+                try:
+                    current = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                    yield sse_event("status", current)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+                
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                
+                # Low-frequency safety net in case the transition was published elsewhere
+                if time.monotonic() - last_check >= PAYMENT_EVENTS_RECHECK_SECONDS:
+                    last_check = time.monotonic()
+                    fresh_payment = await Payment.get(payment.id)
+                    if fresh_payment and fresh_payment.status != current["payment_status"]:
+                        fresh_order = await Order.get(fresh_payment.order_id) or order
+                        current = payment_status_payload(fresh_payment, fresh_order)
+                        yield sse_event("status", current)
+        finally:
+            broker.unsubscribe(channel, queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ==================== MY SERVICES ROUTES ====================
 
 @api_router.get("/services/my")
-async def get_my_services(current_user: User = Depends(get_current_user)):
+async def get_my_services(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    current_user: AuthUser = Depends(get_current_user)
+):
     """Get all user's active services"""
-    orders = await Order.find(Order.user_id == current_user.id).to_list()
+    # Package titles come from the catalog, so its version is part of the tag
+    etag = await user_etag(current_user.id, "services", "-" + package_catalog.etag.strip('"'))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
+    orders, next_cursor = await paginate(Order, {"user_id": current_user.id}, page)
+    packages = await resolve_packages({order.package_id for order in orders})
     
     services = []
     for order in orders:
-        package = await Package.get(order.package_id) if order.package_id else None
+        package = packages.get(str(order.package_id))
         
         services.append({
             "id": str(order.id),
@@ -1401,10 +3648,10 @@ async def get_my_services(current_user: User = Depends(get_current_user)):
             "period_months": order.period_months
         })
     
-    return services
+    return {"items": services, "next_cursor": next_cursor}
 
 @api_router.post("/services/{order_id}/renew")
-async def renew_service(order_id: str, current_user: User = Depends(get_current_user)):
+async def renew_service(order_id: str, current_user: AuthUser = Depends(get_current_user)):
     """Renew a service - extends expiry by 1 year"""
     order = await Order.get(order_id)
     
@@ -1417,8 +3664,15 @@ async def renew_service(order_id: str, current_user: User = Depends(get_current_
     else:
         order.expires_at = datetime.now(timezone.utc) + timedelta(days=365)
     
+    previous_status = order.status
     order.status = "active"
     await order.save()
+    await bump_user_versions("services", [current_user.id])
+    await bump_metrics({"orders": order_change((previous_status, order.price_cents), (order.status, order.price_cents))})
+    await record_events(user_event(
+        order.user_id, "service_renewed", f"{order.id}:{order.expires_at.date().isoformat()}",
+        domain=order.domain, expires_at=order.expires_at
+    ))
     
     # Create notification
     notification = Notification(
@@ -1427,7 +3681,7 @@ async def renew_service(order_id: str, current_user: User = Depends(get_current_
         message=f"Your service for {order.domain} has been renewed for 1 year.",
         type="order"
     )
-    await notification.insert()
+    await push_notification(notification)
     
     return {
         "message": "Service renewed successfully",
@@ -1436,52 +3690,101 @@ async def renew_service(order_id: str, current_user: User = Depends(get_current_
 
 # ==================== NOTIFICATION ROUTES ====================
 
+async def notifications_etag(user_id: PydanticObjectId) -> str:
+    """ETag shared by the notification list and the unread count.
+
+    Two changes do not bump the user's version. A broadcast sent from
+    another worker shows up once this worker's index refreshes, within
+    BROADCAST_INDEX_REFRESH_SECONDS. A read notification removed by the
+    TTL monitor stays listed until the next notification write. Within
+    those bounds a 304 can be stale.
+    """
+    return await user_etag(user_id, "notifications", "-" + broadcast_index.version)
+
 @api_router.get("/notifications")
-async def get_notifications(current_user: User = Depends(get_current_user)):
+async def get_notifications(request: Request, response: Response, current_user: AuthUser = Depends(get_current_user)):
     """Get user notifications"""
+    etag = await notifications_etag(current_user.id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
+    state = await get_notification_state(current_user)
     notifications = await Notification.find(
-        Notification.user_id == current_user.id
+        notification_feed_filter(current_user)
     ).sort(-Notification.created_at).to_list(50)
     
-    return [
-        {
-            "id": str(n.id),
-            "title": n.title,
-            "message": n.message,
-            "type": n.type,
-            "category": n.category,
-            "is_read": n.is_read,
-            "created_at": n.created_at.isoformat()
-        }
-        for n in notifications
-    ]
+    return [notification_payload(n, state) for n in notifications]
+
+@api_router.get("/notifications/events")
+async def notification_events(request: Request, current_user: AuthUser = Depends(get_stream_user)):
+    """Push new notifications and read-state changes as server-sent events"""
+    channel = f"notifications:{current_user.id}"
+    
+    async def unread_count() -> Dict[str, Any]:
+        return {"count": await unread_notification_count(current_user)}
+    
+    async def stream():
+        # Subscribe before counting so nothing published in between is lost
+        queue = broker.subscribe(channel)
+        if receives_broadcasts(current_user):
+            broker.subscribe(BROADCAST_CHANNEL, queue)
+        try:
+            yield sse_event("unread_count", await unread_count())
+            
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                    yield sse_event(message["event"], message)
+                    if message["event"] == "read":
+                        # Another tab may have read notifications this one never saw
+                        yield sse_event("unread_count", await unread_count())
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+                
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+        finally:
+            broker.unsubscribe(channel, queue)
+            broker.unsubscribe(BROADCAST_CHANNEL, queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.patch("/notifications/{notification_id}/read")
-async def mark_notification_read(notification_id: str, current_user: User = Depends(get_current_user)):
+async def mark_notification_read(notification_id: str, current_user: AuthUser = Depends(get_current_user)):
     """Mark notification as read"""
     notification = await Notification.get(notification_id)
     
-    if not notification or notification.user_id != current_user.id:
+    is_broadcast = notification is not None and notification.user_id is None and receives_broadcasts(current_user)
+    if not notification or (notification.user_id != current_user.id and not is_broadcast):
         raise HTTPException(status_code=404, detail="Notification not found")
     
-    notification.is_read = True
-    await notification.save()
+    await mark_notifications_read(current_user, [notification.id])
     
     return {"message": "Notification marked as read"}
 
+@api_router.post("/notifications/read")
+async def mark_notifications_read_bulk(data: NotificationIds, current_user: AuthUser = Depends(get_current_user)):
+    """Mark a batch of notifications as read"""
+    try:
+        ids = [PydanticObjectId(i) for i in data.ids]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid notification id")
+    
+    count = await mark_notifications_read(current_user, ids)
+    return {"message": f"{count} notifications marked as read", "count": count}
+
 @api_router.post("/notifications/read-all")
-async def mark_all_read(current_user: User = Depends(get_current_user)):
+async def mark_all_read(current_user: AuthUser = Depends(get_current_user)):
     """Mark all notifications as read"""
-    notifications = await Notification.find(
-        Notification.user_id == current_user.id,
-        Notification.is_read == False
-    ).to_list()
-    
-    for n in notifications:
-        n.is_read = True
-        await n.save()
-    
-    return {"message": f"{len(notifications)} notifications marked as read"}
+    count = await mark_notifications_read(current_user)
+    return {"message": f"{count} notifications marked as read", "count": count}
 
 
 # ==================== AI SUPPORT CHAT ROUTES ====================
@@ -1525,7 +3828,7 @@ AI_FAQ_DATABASE = {
 @api_router.post("/support/chat")
 async def ai_support_chat(
     query: Dict[str, str],
-    current_user: User = Depends(get_current_user)
+    current_user: AuthUser = Depends(get_current_user)
 ):
     """AI Support Chat - Mock FAQ with intelligent matching"""
     user_query = query.get("message", "").lower().strip()
@@ -1581,7 +3884,7 @@ async def ai_support_chat(
 @api_router.post("/support/tickets")
 async def create_support_ticket(
     ticket_data: Dict[str, str],
-    current_user: User = Depends(get_current_user)
+    current_user: AuthUser = Depends(get_current_user)
 ):
     """Create support ticket (escalated from AI or manual)"""
     ticket = SupportTicket(
@@ -1592,6 +3895,11 @@ async def create_support_ticket(
         priority=ticket_data.get("priority", "medium")
     )
     await ticket.insert()
+    await bump_metrics({"support_tickets": ticket_change(None, ticket.status, ticket.source)})
+    await record_events(user_event(
+        ticket.user_id, "support_ticket", ticket.id, ticket.created_at,
+        subject=ticket.subject, status=ticket.status, replies_count=0
+    ))
     
     # Create notification
     notification = Notification(
@@ -1601,7 +3909,7 @@ async def create_support_ticket(
         type="system",
         category="system"
     )
-    await notification.insert()
+    await push_notification(notification)
     
     return {
         "id": str(ticket.id),
@@ -1612,31 +3920,32 @@ async def create_support_ticket(
     }
 
 @api_router.get("/support/tickets")
-async def get_user_tickets(current_user: User = Depends(get_current_user)):
+async def get_user_tickets(page: PageParams = Depends(), current_user: AuthUser = Depends(get_current_user)):
     """Get user's support tickets"""
-    tickets = await SupportTicket.find(
-        SupportTicket.user_id == current_user.id
-    ).sort(-SupportTicket.created_at).to_list(50)
+    tickets, next_cursor = await paginate(SupportTicket, {"user_id": current_user.id}, page)
     
-    return [
-        {
-            "id": str(t.id),
-            "subject": t.subject,
-            "message": t.message,
-            "status": t.status,
-            "priority": t.priority,
-            "source": t.source,
-            "replies_count": len(t.replies),
-            "created_at": t.created_at.isoformat(),
-            "updated_at": t.updated_at.isoformat()
-        }
-        for t in tickets
-    ]
+    return {
+        "items": [
+            {
+                "id": str(t.id),
+                "subject": t.subject,
+                "message": t.message,
+                "status": t.status,
+                "priority": t.priority,
+                "source": t.source,
+                "replies_count": len(t.replies),
+                "created_at": t.created_at.isoformat(),
+                "updated_at": t.updated_at.isoformat()
+            }
+            for t in tickets
+        ],
+        "next_cursor": next_cursor
+    }
 
 @api_router.get("/support/tickets/{ticket_id}")
 async def get_ticket_detail(
     ticket_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthUser = Depends(get_current_user)
 ):
     """Get ticket details with replies"""
     ticket = await SupportTicket.get(ticket_id)
@@ -1661,18 +3970,23 @@ async def get_ticket_detail(
 @api_router.get("/admin/support/tickets")
 async def admin_get_all_tickets(
     status: Optional[str] = None,
-    admin_user: User = Depends(get_admin_user)
+    page: PageParams = Depends(),
+    admin_user: TokenUser = Depends(get_admin_user)
 ):
     """Admin: Get all support tickets"""
-    query = {}
+    filters: Dict[str, Any] = {}
     if status:
-        query[SupportTicket.status] = status
+        filters["status"] = status
+    
+    tickets, next_cursor = await paginate(SupportTicket, filters, page)
     
-    tickets = await SupportTicket.find(query).sort(-SupportTicket.created_at).to_list()
+    # Resolve ticket owners with one query for the whole page
+    user_ids = list({t.user_id for t in tickets})
+    users = {u.id: u for u in await User.find(In(User.id, user_ids)).to_list()} if user_ids else {}
     
     result = []
     for t in tickets:
-        user = await User.get(t.user_id)
+        user = users.get(t.user_id)
         result.append({
             "id": str(t.id),
             "subject": t.subject,
@@ -1687,13 +4001,13 @@ async def admin_get_all_tickets(
             "updated_at": t.updated_at.isoformat()
         })
     
-    return result
+    return {"items": result, "next_cursor": next_cursor}
 
 @api_router.patch("/admin/support/tickets/{ticket_id}")
 async def admin_update_ticket(
     ticket_id: str,
     update_data: Dict[str, Any],
-    admin_user: User = Depends(get_admin_user)
+    admin_user: TokenUser = Depends(get_admin_user)
 ):
     """Admin: Update ticket status or add reply"""
     ticket = await SupportTicket.get(ticket_id)
@@ -1702,7 +4016,10 @@ async def admin_update_ticket(
         raise HTTPException(status_code=404, detail="Ticket not found")
     
     # Update status
+    previous_status = ticket.status
     if "status" in update_data:
+        if update_data["status"] not in SUPPORT_TICKET_STATUSES:
+            raise HTTPException(status_code=400, detail="Invalid ticket status")
         ticket.status = update_data["status"]
     
     # Add reply
@@ -1722,26 +4039,41 @@ async def admin_update_ticket(
             type="system",
             category="system"
         )
-        await notification.insert()
+        await push_notification(notification)
     
     ticket.updated_at = datetime.now(timezone.utc)
     await ticket.save()
+    if ticket.status != previous_status:
+        await bump_metrics({"support_tickets": ticket_change(previous_status, ticket.status)})
+    
+    # The ticket's timeline entry shows its current status and reply count
+    await UserEvent.find_one(UserEvent.key == f"support_ticket:{ticket.id}").update(
+        Set({"data.status": ticket.status, "data.replies_count": len(ticket.replies)})
+    )
+    
+    if "reply" in update_data:
+        await record_events(user_event(
+            ticket.user_id, "ticket_reply", f"{ticket.id}:{len(ticket.replies) - 1}",
+            subject=ticket.subject, ticket_id=str(ticket.id)
+        ))
     
     return {"message": "Ticket updated successfully"}
 
 @api_router.get("/admin/support/stats")
-async def admin_support_stats(admin_user: User = Depends(get_admin_user)):
+async def admin_support_stats(admin_user: TokenUser = Depends(get_admin_user)):
     """Admin: Get support statistics"""
-    all_tickets = await SupportTicket.find().to_list()
+    tickets = (await read_metrics("support_tickets"))["support_tickets"]
+    by_status = tickets.get("count", {})
+    by_source = tickets.get("source", {})
     
     stats = {
-        "total": len(all_tickets),
-        "open": len([t for t in all_tickets if t.status == "open"]),
-        "in_progress": len([t for t in all_tickets if t.status == "in_progress"]),
-        "resolved": len([t for t in all_tickets if t.status == "resolved"]),
-        "closed": len([t for t in all_tickets if t.status == "closed"]),
-        "ai_escalated": len([t for t in all_tickets if t.source == "ai_escalation"]),
-        "manual": len([t for t in all_tickets if t.source == "manual"])
+        "total": sum(by_status.values()),
+        "open": by_status.get("open", 0),
+        "in_progress": by_status.get("in_progress", 0),
+        "resolved": by_status.get("resolved", 0),
+        "closed": by_status.get("closed", 0),
+        "ai_escalated": by_source.get("ai_escalation", 0),
+        "manual": by_source.get("manual", 0)
     }
     
     return stats
@@ -1749,19 +4081,21 @@ async def admin_support_stats(admin_user: User = Depends(get_admin_user)):
 # ==================== NOTIFICATION ENHANCEMENT ====================
 
 @api_router.get("/notifications/unread-count")
-async def get_unread_count(current_user: User = Depends(get_current_user)):
+async def get_unread_count(request: Request, response: Response, current_user: AuthUser = Depends(get_current_user)):
     """Get unread notifications count"""
-    count = await Notification.find(
-        Notification.user_id == current_user.id,
-        Notification.is_read == False
-    ).count()
+    etag = await notifications_etag(current_user.id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
+    count = await unread_notification_count(current_user)
     
     return {"count": count}
 
 @api_router.post("/admin/notifications/broadcast")
 async def broadcast_notification(
     data: Dict[str, Any],
-    admin_user: User = Depends(get_admin_user)
+    admin_user: TokenUser = Depends(get_admin_user)
 ):
     """Admin: Broadcast notification to all users or specific group"""
     title = data.get("title", "")
@@ -1769,136 +4103,209 @@ async def broadcast_notification(
     category = data.get("category", "system")  # promo, system, maintenance
     target = data.get("target", "all")  # all, active_users, etc
     
-    # Get target users
-    if target == "all":
-        users = await User.find(User.role == "user").to_list()
-    else:
-        users = await User.find(User.role == "user").to_list()  # Simplified
+    users_count = await User.find(User.role == "user").count()
     
-    # Create notification for each user
-    notifications_created = 0
-    for user in users:
-        notification = Notification(
-            user_id=user.id,
+    if target == "all":
+        # Stored once and merged into each feed at read time
+        notification = await push_broadcast(Notification(
             title=title,
             message=message,
             type="announcement",
             category=category
-        )
-        await notification.insert()
-        notifications_created += 1
+        ))
+        await ActivityLog(
+            admin_user_id=admin_user.id,
+            action="broadcast_notification",
+            meta={"title": title, "users_count": users_count, "category": category,
+                  "notification_id": str(notification.id)}
+        ).insert()
+        return {
+            "message": f"Notification broadcasted to {users_count} users",
+            "count": users_count
+        }
+    
+    # Segments are snapshotted per user by a background job; the admin polls it for progress
+    job = BroadcastJob(
+        admin_user_id=admin_user.id,
+        title=title,
+        message=message,
+        category=category,
+        target=target,
+        total_users=users_count  # segments are not resolved yet and cover every user
+    )
+    await job.insert()
     
     # Log activity
     log = ActivityLog(
         admin_user_id=admin_user.id,
         action="broadcast_notification",
-        meta={"title": title, "users_count": notifications_created, "category": category}
+        meta={"title": title, "users_count": job.total_users, "category": category, "job_id": str(job.id)}
     )
     await log.insert()
     
     return {
-        "message": f"Notification broadcasted to {notifications_created} users",
-        "count": notifications_created
+        "message": f"Broadcast to {job.total_users} users queued",
+        "count": job.total_users,
+        "job": broadcast_job_payload(job)
     }
 
+@api_router.get("/admin/notifications/broadcast/{job_id}")
+async def get_broadcast_job(job_id: str, admin_user: TokenUser = Depends(get_admin_user)):
+    """Admin: Progress of a broadcast job"""
+    try:
+        job = await BroadcastJob.get(job_id)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Broadcast job not found")
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast job not found")
+    
+    return broadcast_job_payload(job)
+
 # ==================== ACTIVITY TIMELINE ROUTES ====================
 
-@api_router.get("/history/timeline")
-async def get_activity_timeline(current_user: User = Depends(get_current_user)):
-    """Get user activity timeline (orders, payments, tickets, etc)"""
-    timeline = []
-    
-    # Get orders
-    orders = await Order.find(
-        Order.user_id == current_user.id
-    ).sort(-Order.created_at).limit(50).to_list()
+def timeline_event(raw: Dict[str, Any], packages: Dict[str, CatalogPackage]) -> Dict[str, Any]:
+    """Shape a raw timeline row into the event the activity page renders.
+
+    ``packages`` holds the page's order packages, as returned by resolve_packages.
+    """
+    kind = raw["kind"]
+    timestamp = raw["ts"].isoformat()
     
-    for order in orders:
-        package = await Package.get(order.package_id)
-        
-        # Order created event
-        timeline.append({
+    if kind == "order_created":
+        package = packages.get(str(raw.get("package_id")))
+        return {
             "type": "order_created",
             "icon": "📦",
             "title": "Order Created",
-            "description": f"Order domain {order.domain}",
+            "description": f"Order domain {raw['domain']}",
             "meta": {
-                "domain": order.domain,
+                "domain": raw["domain"],
                 "package": package.title if package else "Custom",
-                "price": order.price_cents
+                "price": raw["price_cents"]
             },
-            "timestamp": order.created_at.isoformat()
-        })
-        
-        # Payment events
-        payments = await Payment.find(Payment.order_id == order.id).to_list()
-        for payment in payments:
-            if payment.status == "success":
-                timeline.append({
-                    "type": "payment_success",
-                    "icon": "💳",
-                    "title": "Payment Success",
-                    "description": f"Payment Rp{payment.amount_cents // 100:,} sukses",
-                    "meta": {
-                        "amount": payment.amount_cents,
-                        "method": payment.method
-                    },
-                    "timestamp": payment.created_at.isoformat()
-                })
-        
-        # Service activation
-        if order.status == "active" and order.expires_at:
-            timeline.append({
-                "type": "service_active",
-                "icon": "🌐",
-                "title": "Service Active",
-                "description": f"Domain {order.domain} active",
-                "meta": {
-                    "domain": order.domain,
-                    "expires_at": order.expires_at.isoformat()
-                },
-                "timestamp": order.created_at.isoformat()
-            })
-    
-    # Get support tickets
-    tickets = await SupportTicket.find(
-        SupportTicket.user_id == current_user.id
-    ).limit(20).to_list()
-    
-    for ticket in tickets:
-        timeline.append({
-            "type": "support_ticket",
-            "icon": "🤖",
-            "title": "Support Ticket",
-            "description": ticket.subject,
+            "timestamp": timestamp
+        }
+    if kind == "payment_success":
+        return {
+            "type": "payment_success",
+            "icon": "💳",
+            "title": "Payment Success",
+            "description": f"Payment Rp{raw['amount_cents'] // 100:,} sukses",
             "meta": {
-                "status": ticket.status,
-                "replies_count": len(ticket.replies)
+                "amount": raw["amount_cents"],
+                "method": raw["method"]
             },
-            "timestamp": ticket.created_at.isoformat()
-        })
+            "timestamp": timestamp
+        }
+    if kind == "payment_failed":
+        return {
+            "type": "payment_failed",
+            "icon": "❌",
+            "title": "Payment Failed",
+            "description": f"Payment Rp{raw['amount_cents'] // 100:,} gagal",
+            "meta": {
+                "amount": raw["amount_cents"],
+                "method": raw["method"]
+            },
+            "timestamp": timestamp
+        }
+    if kind == "service_active":
+        return {
+            "type": "service_active",
+            "icon": "🌐",
+            "title": "Service Active",
+            "description": f"Domain {raw['domain']} active",
+            "meta": {
+                "domain": raw["domain"],
+                "expires_at": raw["expires_at"].isoformat()
+            },
+            "timestamp": timestamp
+        }
+    if kind == "service_renewed":
+        return {
+            "type": "service_renewed",
+            "icon": "🔄",
+            "title": "Service Renewed",
+            "description": f"Domain {raw['domain']} diperpanjang",
+            "meta": {
+                "domain": raw["domain"],
+                "expires_at": raw["expires_at"].isoformat()
+            },
+            "timestamp": timestamp
+        }
+    if kind == "ticket_reply":
+        return {
+            "type": "ticket_reply",
+            "icon": "💬",
+            "title": "Support Reply",
+            "description": raw["subject"],
+            "meta": {"ticket_id": raw["ticket_id"]},
+            "timestamp": timestamp
+        }
+    if kind == "referral_conversion":
+        return {
+            "type": "referral_conversion",
+            "icon": "🎁",
+            "title": "Referral Conversion",
+            "description": f"Referral conversion #{raw['conversions']}",
+            "meta": {"conversions": raw["conversions"]},
+            "timestamp": timestamp
+        }
+    return {
+        "type": "support_ticket",
+        "icon": "🤖",
+        "title": "Support Ticket",
+        "description": raw["subject"],
+        "meta": {
+            "status": raw["status"],
+            "replies_count": raw["replies_count"]
+        },
+        "timestamp": timestamp
+    }
+
+@api_router.get("/history/timeline")
+async def get_activity_timeline(page: PageParams = Depends(), current_user: AuthUser = Depends(get_current_user)):
+    """Get user activity timeline (orders, payments, tickets, etc)"""
+    events = await UserEvent.find(
+        UserEvent.user_id == current_user.id,
+        keyset_filter("ts", page.cursor, id_field="key", parse_id=str)
+    ).sort(-UserEvent.ts, -UserEvent.key).limit(page.limit + 1).to_list()
+    
+    next_cursor = None
+    if len(events) > page.limit:
+        events = events[:page.limit]
+        next_cursor = encode_cursor("ts", events[-1].ts, events[-1].key)
     
-    # Sort by timestamp (newest first)
-    timeline.sort(key=lambda x: x["timestamp"], reverse=True)
+    # Resolved per page so a package newer than this worker's catalog still has a title
+    packages = await resolve_packages({
+        event.data.get("package_id") for event in events if event.kind == "order_created"
+    })
     
-    return timeline[:50]  # Return last 50 events
+    return {
+        "items": [timeline_event({**event.data, "kind": event.kind, "ts": event.ts}, packages) for event in events],
+        "next_cursor": next_cursor
+    }
 
 # ==================== REFERRAL & REWARDS ROUTES ====================
 
 @api_router.get("/referral/me")
-async def get_referral_info(current_user: User = Depends(get_current_user)):
+async def get_referral_info(current_user: AuthUser = Depends(get_current_user)):
     """Get user referral information"""
     # Get or create referral
     referral = await Referral.find_one(Referral.user_id == current_user.id)
     
     if not referral:
-        # Generate unique referral code
-        code = f"REF{str(current_user.id)[:8].upper()}"
         referral = Referral(
             user_id=current_user.id,
-            code=code
+            code=referral_code_for(current_user.id)
         )
-        await referral.insert()
+        try:
+            await referral.insert()
+            await bump_metrics({"referrals": {"users": 1}})
+        except DuplicateKeyError:
+            # A concurrent request created it first
+            referral = await Referral.find_one(Referral.user_id == current_user.id)
     
     # Simulate some data for demo
     return {
@@ -1942,11 +4349,12 @@ async def get_referral_info(current_user: User = Depends(get_current_user)):
     }
 
 @api_router.post("/referral/simulate-click")
-async def simulate_referral_click(current_user: User = Depends(get_current_user)):
+async def simulate_referral_click(current_user: AuthUser = Depends(get_current_user)):
     """Simulate referral click (for demo purposes)"""
     referral = await Referral.find_one(Referral.user_id == current_user.id)
     
     if referral:
+        signups_before, conversions_before = referral.signups, referral.conversions
         referral.clicks += 1
         # Random chance to simulate signup and conversion
         if random.random() > 0.7:  # 30% chance
@@ -1956,6 +4364,16 @@ async def simulate_referral_click(current_user: User = Depends(get_current_user)
                 referral.rewards_earned_cents += 50000  # Rp 50k per conversion
         
         await referral.save()
+        await bump_metrics({"referrals": {
+            "clicks": 1,
+            "signups": referral.signups - signups_before,
+            "conversions": referral.conversions - conversions_before
+        }})
+        if referral.conversions > conversions_before:
+            await record_events(user_event(
+                current_user.id, "referral_conversion", f"{referral.id}:{referral.conversions}",
+                conversions=referral.conversions
+            ))
         
         return {
             "message": "Referral click simulated",
@@ -1971,7 +4389,7 @@ async def simulate_referral_click(current_user: User = Depends(get_current_user)
 # ==================== USER PROFILE & GAMIFICATION ====================
 
 @api_router.get("/profile/completion")
-async def get_profile_completion(current_user: User = Depends(get_current_user)):
+async def get_profile_completion(current_user: AuthUser = Depends(get_current_user)):
     """Calculate profile completion percentage"""
     profile = await UserProfile.find_one(UserProfile.user_id == current_user.id)
     
@@ -2036,7 +4454,7 @@ async def get_profile_completion(current_user: User = Depends(get_current_user))
     }
 
 @api_router.post("/profile/complete-onboarding")
-async def complete_onboarding(current_user: User = Depends(get_current_user)):
+async def complete_onboarding(current_user: AuthUser = Depends(get_current_user)):
     """Mark onboarding as completed"""
     profile = await UserProfile.find_one(UserProfile.user_id == current_user.id)
     
@@ -2055,7 +4473,7 @@ async def complete_onboarding(current_user: User = Depends(get_current_user)):
     return {"message": "Onboarding completed successfully"}
 
 @api_router.get("/profile/badges")
-async def get_user_badges(current_user: User = Depends(get_current_user)):
+async def get_user_badges(current_user: AuthUser = Depends(get_current_user)):
     """Get user badges and achievements"""
     profile = await UserProfile.find_one(UserProfile.user_id == current_user.id)
     
@@ -2130,52 +4548,54 @@ async def get_user_badges(current_user: User = Depends(get_current_user)):
 # ==================== ADMIN ANALYTICS ENHANCEMENT ====================
 
 @api_router.get("/admin/analytics/advanced")
-async def admin_advanced_analytics(admin_user: User = Depends(get_admin_user)):
+async def admin_advanced_analytics(admin_user: TokenUser = Depends(get_admin_user)):
     """Admin: Get advanced analytics including lifecycle, referrals, etc"""
+    # Everything is read from the maintained counters, one document per entity
+    metrics = await read_metrics("orders", "payments", "referrals", "support_tickets")
     
     # Service lifecycle stats
-    all_orders = await Order.find().to_list()
+    orders_by_status = metrics["orders"].get("count", {})
     lifecycle_stats = {
-        "total": len(all_orders),
-        "pending": len([o for o in all_orders if o.status == "pending"]),
-        "paid": len([o for o in all_orders if o.status == "paid"]),
-        "active": len([o for o in all_orders if o.status == "active"]),
-        "expired": len([o for o in all_orders if o.status == "expired"]),
-        "cancelled": len([o for o in all_orders if o.status == "cancelled"])
+        "total": sum(orders_by_status.values()),
+        **{name: orders_by_status.get(name, 0) for name in ("pending", "paid", "active", "expired", "cancelled")}
     }
     
     # Payment stats
-    all_payments = await Payment.find().to_list()
+    payments_by_status = metrics["payments"].get("count", {})
+    total_attempts = sum(payments_by_status.values())
+    successful = {
+        "count": payments_by_status.get("success", 0),
+        "amount_cents": metrics["payments"].get("amount_cents", {}).get("success", 0)
+    }
     payment_stats = {
-        "total_attempts": len(all_payments),
-        "success": len([p for p in all_payments if p.status == "success"]),
-        "pending": len([p for p in all_payments if p.status == "pending"]),
-        "failed": len([p for p in all_payments if p.status == "failed"]),
-        "success_rate": round((len([p for p in all_payments if p.status == "success"]) / len(all_payments) * 100), 2) if all_payments else 0
+        "total_attempts": total_attempts,
+        "success": successful["count"],
+        "pending": payments_by_status.get("pending", 0),
+        "failed": payments_by_status.get("failed", 0),
+        "success_rate": round(successful["count"] / total_attempts * 100, 2) if total_attempts else 0
     }
     
     # Referral stats
-    all_referrals = await Referral.find().to_list()
+    referrals = {key: metrics["referrals"].get(key, 0) for key in ("users", "clicks", "signups", "conversions")}
     referral_stats = {
-        "total_users": len(all_referrals),
-        "total_clicks": sum(r.clicks for r in all_referrals),
-        "total_signups": sum(r.signups for r in all_referrals),
-        "total_conversions": sum(r.conversions for r in all_referrals),
-        "conversion_rate": round((sum(r.conversions for r in all_referrals) / sum(r.signups for r in all_referrals) * 100), 2) if sum(r.signups for r in all_referrals) > 0 else 0
+        "total_users": referrals["users"],
+        "total_clicks": referrals["clicks"],
+        "total_signups": referrals["signups"],
+        "total_conversions": referrals["conversions"],
+        "conversion_rate": round(referrals["conversions"] / referrals["signups"] * 100, 2) if referrals["signups"] > 0 else 0
     }
     
     # Support stats
-    support_tickets = await SupportTicket.find().to_list()
+    tickets_by_status = metrics["support_tickets"].get("count", {})
     support_stats = {
-        "total": len(support_tickets),
-        "open": len([t for t in support_tickets if t.status == "open"]),
-        "resolved": len([t for t in support_tickets if t.status == "resolved"]),
-        "ai_escalated": len([t for t in support_tickets if t.source == "ai_escalation"])
+        "total": sum(tickets_by_status.values()),
+        "open": tickets_by_status.get("open", 0),
+        "resolved": tickets_by_status.get("resolved", 0),
+        "ai_escalated": metrics["support_tickets"].get("source", {}).get("ai_escalation", 0)
     }
     
     # Revenue calculation
-    successful_payments = [p for p in all_payments if p.status == "success"]
-    total_revenue = sum(p.amount_cents for p in successful_payments)
+    total_revenue = successful["amount_cents"]
     
     return {
         "lifecycle": lifecycle_stats,
@@ -2185,59 +4605,78 @@ async def admin_advanced_analytics(admin_user: User = Depends(get_admin_user)):
         "revenue": {
             "total_cents": total_revenue,
             "total_idr": f"Rp {total_revenue // 100:,}",
-            "average_order_value": total_revenue // len(successful_payments) if successful_payments else 0
+            "average_order_value": total_revenue // successful["count"] if successful["count"] else 0
         }
     }
 
 @api_router.get("/admin/users/{user_id}/activity")
 async def admin_get_user_activity(
     user_id: str,
-    admin_user: User = Depends(get_admin_user)
+    page: PageParams = Depends(),
+    admin_user: TokenUser = Depends(get_admin_user)
 ):
     """Admin: Get detailed user activity timeline"""
     user = await User.get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    activity = []
+    cursor = decode_cursor(page.cursor, "activity", parse_activity_key) if page.cursor else None
+    
+    async def orders():
+        async for order in Order.find(
+            Order.user_id == user.id, merged_source_filter("order", cursor)
+        ).sort(-Order.created_at, -Order.id).limit(page.limit + 1):
+            yield {
+                "type": "order",
+                "description": f"Order {order.domain}",
+                "status": order.status,
+                "amount": order.price_cents,
+                "timestamp": order.created_at,
+                "key": f"order:{order.id}"
+            }
     
-    # Orders
-    orders = await Order.find(Order.user_id == user.id).sort(-Order.created_at).to_list()
-    for order in orders:
-        activity.append({
-            "type": "order",
-            "description": f"Order {order.domain}",
-            "status": order.status,
-            "amount": order.price_cents,
-            "timestamp": order.created_at.isoformat()
-        })
+    async def tickets():
+        async for ticket in SupportTicket.find(
+            SupportTicket.user_id == user.id, merged_source_filter("support", cursor)
+        ).sort(-SupportTicket.created_at, -SupportTicket.id).limit(page.limit + 1):
+            yield {
+                "type": "support",
+                "description": ticket.subject,
+                "status": ticket.status,
+                "timestamp": ticket.created_at,
+                "key": f"support:{ticket.id}"
+            }
     
-    # Support tickets
-    tickets = await SupportTicket.find(SupportTicket.user_id == user.id).sort(-SupportTicket.created_at).to_list()
-    for ticket in tickets:
-        activity.append({
-            "type": "support",
-            "description": ticket.subject,
-            "status": ticket.status,
-            "timestamp": ticket.created_at.isoformat()
-        })
+    async def referrals():
+        async for referral in Referral.find(
+            Referral.user_id == user.id, merged_source_filter("referral", cursor)
+        ).sort(-Referral.created_at, -Referral.id).limit(page.limit + 1):
+            yield {
+                "type": "referral",
+                "description": f"Referral program: {referral.conversions} conversions",
+                "stats": {
+                    "clicks": referral.clicks,
+                    "signups": referral.signups,
+                    "conversions": referral.conversions
+                },
+                "timestamp": referral.created_at,
+                "key": f"referral:{referral.id}"
+            }
     
-    # Referrals
-    referral = await Referral.find_one(Referral.user_id == user.id)
-    if referral:
-        activity.append({
-            "type": "referral",
-            "description": f"Referral program: {referral.conversions} conversions",
-            "stats": {
-                "clicks": referral.clicks,
-                "signups": referral.signups,
-                "conversions": referral.conversions
-            },
-            "timestamp": referral.created_at.isoformat()
-        })
+    activity = await merge_newest(
+        [orders(), tickets(), referrals()],
+        sort_key=lambda item: (item["timestamp"], item["key"]),
+        limit=page.limit + 1
+    )
     
-    # Sort by timestamp
-    activity.sort(key=lambda x: x["timestamp"], reverse=True)
+    next_cursor = None
+    if len(activity) > page.limit:
+        activity = activity[:page.limit]
+        next_cursor = encode_cursor("activity", activity[-1]["timestamp"], activity[-1]["key"])
+    
+    for item in activity:
+        item["timestamp"] = item["timestamp"].isoformat()
+        del item["key"]
     
     return {
         "user": {
@@ -2246,14 +4685,15 @@ async def admin_get_user_activity(
             "email": user.email,
             "created_at": user.created_at.isoformat()
         },
-        "activity": activity
+        "activity": activity,
+        "next_cursor": next_cursor
     }
 
 @api_router.patch("/admin/users/{user_id}/suspend")
 async def admin_suspend_user(
     user_id: str,
     data: Dict[str, Any],
-    admin_user: User = Depends(get_admin_user)
+    admin_user: TokenUser = Depends(get_admin_user)
 ):
     """Admin: Suspend or unsuspend user (simulation)"""
     user = await User.get(user_id)
@@ -2271,6 +4711,12 @@ async def admin_suspend_user(
     )
     await log.insert()
     
+    # Revoke existing sessions so suspension takes effect immediately
+    if suspend:
+        await token_versions.revoke(user)
+    else:
+        auth_cache.invalidate(user.email)
+    
     # Send notification to user
     notification = Notification(
         user_id=user.id,
@@ -2279,7 +4725,7 @@ async def admin_suspend_user(
         type="system",
         category="system"
     )
-    await notification.insert()
+    await push_notification(notification)
     
     return {
         "message": f"User {'suspended' if suspend else 'unsuspended'} successfully",
@@ -2288,8 +4734,25 @@ async def admin_suspend_user(
 
 # ==================== SYSTEM SETTINGS ====================
 
+@api_router.get("/admin/indexes")
+async def get_index_report(admin_user: TokenUser = Depends(get_admin_user)):
+    """Admin: Report missing or unused MongoDB indexes"""
+    return await verify_indexes()
+
+@api_router.post("/admin/metrics/reconcile")
+async def reconcile_business_metrics(admin_user: TokenUser = Depends(get_admin_user)):
+    """Admin: Rebuild the business counters now instead of waiting for the hourly run"""
+    return {"fixed": await reconcile_metrics()}
+
+@api_router.get("/admin/cache/stats")
+async def get_cache_stats(admin_user: TokenUser = Depends(get_admin_user)):
+    """Admin: Get in-process cache statistics"""
+    return {
+        "auth": auth_cache.stats()
+    }
+
 @api_router.get("/admin/settings/global")
-async def get_global_settings(admin_user: User = Depends(get_admin_user)):
+async def get_global_settings(admin_user: TokenUser = Depends(get_admin_user)):
     """Admin: Get global system settings"""
     # In a real app, store these in a Settings collection
     # For now, return mock data
@@ -2314,7 +4777,7 @@ async def get_global_settings(admin_user: User = Depends(get_admin_user)):
 @api_router.patch("/admin/settings/global")
 async def update_global_settings(
     data: Dict[str, Any],
-    admin_user: User = Depends(get_admin_user)
+    admin_user: TokenUser = Depends(get_admin_user)
 ):
     """Admin: Update global system settings"""
     # In a real app, save to database
@@ -2333,6 +4796,18 @@ async def update_global_settings(
 
 app.include_router(api_router)
 
+if DB_QUERY_COUNT_HEADER:
+    @app.middleware("http")
+    async def count_db_queries(request: Request, call_next):
+        counter = [0]
+        token = _request_db_queries.set(counter)
+        try:
+            response = await call_next(request)
+        finally:
+            _request_db_queries.reset(token)
+        response.headers["X-DB-Query-Count"] = str(counter[0])
+        return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Backend Benchmarks - HostingIn API
+Load scenarios for the hot paths of the API. Point BENCH_BASE_URL at a
+local or staging instance, never at production.
+"""
+
+import requests
+import os
+import sys
+import time
+import statistics
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+# Configuration
+BASE_URL = os.environ.get("BENCH_BASE_URL", "http://localhost:8001/api")
+TEST_USER = {"email": "test@hostingin.com", "password": "password123"}
+ADMIN_USER = {"email": "admin@hostingin.com", "password": "admin123"}
+WORKERS = int(os.environ.get("BENCH_WORKERS", 1))  # uvicorn workers behind BASE_URL
+# Direct database access for scenarios that need bulk fixtures (same database as the API)
+MONGO_URL = os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("BENCH_DB_NAME", os.environ.get("DB_NAME", "hostingin_db"))  # backend/.env
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples (nearest-rank)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class HostingInBenchmark:
+    def __init__(self):
+        self.results = []
+
+    def log_result(self, name, metrics):
+        """Log benchmark result"""
+        self.results.append({"benchmark": name, **metrics})
+        print(f"📊 {name}")
+        for key, value in metrics.items():
+            if isinstance(value, float):
+                value = f"{value:.2f}"
+            print(f"   {key}: {value}")
+        print()
+
+    def login(self, session=None, user=TEST_USER):
+        """Login (as the test user by default) and return the response"""
+        session = session or requests.Session()
+        return session.post(f"{BASE_URL}/auth/login", data={
+            "username": user["email"],
+            "password": user["password"]
+        })
+
+    def authed_session(self, user=TEST_USER):
+        """Return a session carrying a bearer token for user"""
+        session = requests.Session()
+        token = self.login(session, user).json()["access_token"]
+        session.headers.update({"Authorization": f"Bearer {token}"})
+        return session
+
+    def bench_login_storm(self, logins=400, concurrency=32, probe_path="/packages"):
+        """Login storm: measure latency of an unrelated endpoint while logins run"""
+        stop = threading.Event()
+        probe_latencies = []
+
+        def probe():
+            session = requests.Session()
+            while not stop.is_set():
+                started = time.perf_counter()
+                session.get(f"{BASE_URL}{probe_path}")
+                probe_latencies.append((time.perf_counter() - started) * 1000)
+
+        # Baseline without any login traffic
+        baseline = []
+        session = requests.Session()
+        for _ in range(50):
+            started = time.perf_counter()
+            session.get(f"{BASE_URL}{probe_path}")
+            baseline.append((time.perf_counter() - started) * 1000)
+
+        login_latencies = []
+        failures = 0
+
+        def do_login(_):
+            started = time.perf_counter()
+            response = self.login()
+            login_latencies.append((time.perf_counter() - started) * 1000)
+            return response.status_code
+
+        prober = threading.Thread(target=probe, daemon=True)
+        prober.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for code in pool.map(do_login, range(logins)):
+                if code != 200:
+                    failures += 1
+        elapsed = time.perf_counter() - started
+        stop.set()
+        prober.join()
+
+        self.log_result("Login Storm", {
+            "logins": logins,
+            "concurrency": concurrency,
+            "failed_logins": failures,
+            "logins_per_sec": logins / elapsed,
+            "login_p50_ms": percentile(login_latencies, 50),
+            "login_p99_ms": percentile(login_latencies, 99),
+            f"{probe_path}_baseline_p99_ms": percentile(baseline, 99),
+            f"{probe_path}_storm_p50_ms": statistics.median(probe_latencies) if probe_latencies else 0.0,
+            f"{probe_path}_storm_p99_ms": percentile(probe_latencies, 99),
+        })
+        return failures == 0
+
+    def bench_registration(self, registrations=300, concurrency=32):
+        """Registration throughput: unique signups per second per worker"""
+        run_id = uuid.uuid4().hex[:8]
+        latencies = []
+        failures = 0
+
+        def do_register(i):
+            started = time.perf_counter()
+            response = requests.post(f"{BASE_URL}/auth/register", json={
+                "name": f"Bench User {i}",
+                "email": f"bench-{run_id}-{i}@hostingin.test",
+                "password": "benchpass123"
+            })
+            latencies.append((time.perf_counter() - started) * 1000)
+            return response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for code in pool.map(do_register, range(registrations)):
+                if code != 200:
+                    failures += 1
+        elapsed = time.perf_counter() - started
+
+        # Duplicate signups must still be rejected by the unique index
+        duplicate = requests.post(f"{BASE_URL}/auth/register", json={
+            "name": "Bench User 0",
+            "email": f"bench-{run_id}-0@hostingin.test",
+            "password": "benchpass123"
+        })
+
+        self.log_result("Registration Throughput", {
+            "registrations": registrations,
+            "concurrency": concurrency,
+            "workers": WORKERS,
+            "failed": failures,
+            "registrations_per_sec": registrations / elapsed,
+            "registrations_per_sec_per_worker": registrations / elapsed / WORKERS,
+            "p50_ms": percentile(latencies, 50),
+            "p99_ms": percentile(latencies, 99),
+            "duplicate_status": duplicate.status_code,
+        })
+        return failures == 0 and duplicate.status_code == 400
+
+    def bench_promo_contention(self, orders=2000, concurrency=64, usage_limit=500):
+        """Flash sale: many parallel orders race for one promo code"""
+        admin = self.authed_session(ADMIN_USER)
+        code = f"FLASH{uuid.uuid4().hex[:8].upper()}"
+        response = admin.post(f"{BASE_URL}/admin/promos", json={
+            "code": code,
+            "discount_percent": 50,
+            "expires_at": (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat(),
+            "usage_limit": usage_limit
+        })
+        if response.status_code != 200:
+            print(f"❌ Could not create promo: {response.status_code} {response.text}")
+            return False
+
+        user = self.authed_session()
+        package = user.get(f"{BASE_URL}/packages").json()[0]
+        full_price = package["price_cents"]
+        latencies = []
+
+        def place_order(i):
+            started = time.perf_counter()
+            response = user.post(f"{BASE_URL}/orders", json={
+                "package_id": package["id"],
+                "domain": f"flash-{code.lower()}-{i}.com",
+                "period_months": 1,
+                "promo_code": code
+            })
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                return None
+            return response.json()["order"]["price_cents"]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            prices = list(pool.map(place_order, range(orders)))
+        elapsed = time.perf_counter() - started
+
+        failed = sum(1 for p in prices if p is None)
+        discounted = sum(1 for p in prices if p is not None and p < full_price)
+        usage_count = admin.get(f"{BASE_URL}/admin/promos/{code}").json()["usage_count"]
+
+        self.log_result("Promo Redemption Contention", {
+            "orders": orders,
+            "concurrency": concurrency,
+            "usage_limit": usage_limit,
+            "failed_orders": failed,
+            "discounted_orders": discounted,
+            "promo_usage_count": usage_count,
+            "orders_per_sec": orders / elapsed,
+            "p99_ms": percentile(latencies, 99),
+        })
+        return failed == 0 and discounted == usage_limit and usage_count == usage_limit
+
+    def bench_broadcast(self, timeout_seconds=1800):
+        """Broadcast fan-out: notifications written per second by the background job"""
+        admin = self.authed_session(ADMIN_USER)
+        response = admin.post(f"{BASE_URL}/admin/notifications/broadcast", json={
+            "title": "Benchmark broadcast",
+            "message": f"Broadcast benchmark run {uuid.uuid4().hex[:8]}",
+            "category": "system",
+            "target": "active_users"  # "all" is stored once; segments fan out per user
+        })
+        if response.status_code != 200:
+            print(f"❌ Could not queue broadcast: {response.status_code} {response.text}")
+            return False
+        job = response.json()["job"]
+        enqueue_ms = response.elapsed.total_seconds() * 1000
+
+        deadline = time.time() + timeout_seconds
+        while job["status"] in ("pending", "running") and time.time() < deadline:
+            time.sleep(1)
+            job = admin.get(f"{BASE_URL}/admin/notifications/broadcast/{job['id']}").json()
+
+        duration = 0.0
+        if job["started_at"] and job["finished_at"]:
+            duration = (datetime.fromisoformat(job["finished_at"]) -
+                        datetime.fromisoformat(job["started_at"])).total_seconds()
+
+        self.log_result("Broadcast Fan-out", {
+            "status": job["status"],
+            "total_users": job["total_users"],
+            "notifications_written": job["processed_users"],
+            "enqueue_ms": enqueue_ms,
+            "job_seconds": duration,
+            "notifications_per_sec": job["processed_users"] / duration if duration else 0.0,
+        })
+        return job["status"] == "completed" and job["processed_users"] == job["total_users"]
+
+    def bench_admin_stats(self, orders=1_000_000, samples=10, batch=10_000):
+        """/admin/stats at scale: counter-backed endpoint vs the old load-everything approach"""
+        from pymongo import MongoClient
+        from bson import ObjectId
+
+        db = MongoClient(MONGO_URL)[DB_NAME]
+        run_id = f"bench-{uuid.uuid4().hex[:8]}"
+        user_ids = [u["_id"] for u in db.users.find({}, {"_id": 1}).limit(100)]
+        package_ids = [p["_id"] for p in db.packages.find({}, {"_id": 1})]
+        if not user_ids or not package_ids:
+            print(f"❌ No users or packages in {DB_NAME}; point BENCH_DB_NAME at the API's database")
+            return False
+        statuses = ["pending", "paid", "active", "cancelled", "inactive"]
+        now = datetime.now(timezone.utc)
+
+        admin = self.authed_session(ADMIN_USER)
+        print(f"Seeding {orders} orders ({run_id})...")
+        for start in range(0, orders, batch):
+            db.orders.insert_many([{
+                "user_id": user_ids[i % len(user_ids)],
+                "package_id": package_ids[i % len(package_ids)],
+                "domain": f"{run_id}-{i}.com",
+                "period_months": 1,
+                "price_cents": 100_000 + (i % 50) * 1000,
+                "status": statuses[i % len(statuses)],
+                "created_at": now - timedelta(seconds=i),
+                "bench_run": run_id
+            } for i in range(start, min(start + batch, orders))], ordered=False)
+
+        try:
+            # The rows above bypassed the API, so rebuild the counters the endpoint reads
+            admin.post(f"{BASE_URL}/admin/metrics/reconcile").raise_for_status()
+            total_orders = admin.get(f"{BASE_URL}/admin/stats").json()["total_orders"]
+            if total_orders < orders:
+                print(f"❌ /admin/stats reports {total_orders} orders after seeding {orders}")
+                return False
+
+            new_latencies = []
+            for _ in range(samples):
+                started = time.perf_counter()
+                response = admin.get(f"{BASE_URL}/admin/stats")
+                new_latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    print(f"❌ /admin/stats failed: {response.status_code} {response.text}")
+                    return False
+
+            # Old approach, replayed directly against the database: every order
+            # into memory, then one user lookup per recent order
+            old_latencies = []
+            for _ in range(min(samples, 3)):
+                started = time.perf_counter()
+                all_orders = list(db.orders.find({}))
+                sum(o["price_cents"] for o in all_orders if o["status"] in ("paid", "active"))
+                sum(1 for o in all_orders if o["status"] == "active")
+                recent = sorted(all_orders, key=lambda o: o["created_at"], reverse=True)[:10]
+                for order in recent:
+                    db.users.find_one({"_id": ObjectId(order["user_id"])})
+                old_latencies.append((time.perf_counter() - started) * 1000)
+                del all_orders
+        finally:
+            db.orders.delete_many({"bench_run": run_id})
+            admin.post(f"{BASE_URL}/admin/metrics/reconcile")
+
+        self.log_result("Admin Stats", {
+            "orders_seeded": orders,
+            "counters_p50_ms": percentile(new_latencies, 50),
+            "counters_p99_ms": percentile(new_latencies, 99),
+            "old_p50_ms": percentile(old_latencies, 50),
+            "speedup_p50": percentile(old_latencies, 50) / max(percentile(new_latencies, 50), 0.001),
+        })
+        return True
+
+    def run_all(self, selected=None):
+        """Run all (or the selected) benchmarks"""
+        print("=" * 80)
+        print("HOSTINGIN API BENCHMARKS")
+        print(f"Target: {BASE_URL}")
+        print("=" * 80)
+        print()
+
+        benchmarks = {
+            "login_storm": self.bench_login_storm,
+            "registration": self.bench_registration,
+            "promo_contention": self.bench_promo_contention,
+            "broadcast": self.bench_broadcast,
+            "admin_stats": self.bench_admin_stats,
+        }
+
+        ok = True
+        for name, bench in benchmarks.items():
+            if selected and name not in selected:
+                continue
+            ok = bench() and ok
+        return ok
+
+
+if __name__ == "__main__":
+    benchmark = HostingInBenchmark()
+    success = benchmark.run_all(sys.argv[1:])
+    sys.exit(0 if success else 1)
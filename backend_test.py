@@ -5,6 +5,7 @@ Tests all core transaction and lifecycle endpoints
 """
 
 import requests
+import base64
 import json
 import time
 from datetime import datetime, timedelta
@@ -389,10 +390,11 @@ class HostingInTester:
                 self.log_result("My Services - Get", False, error=f"Status: {response.status_code}, Response: {response.text}")
                 return False
             
-            services = response.json()
+            data = response.json()
+            services = data.get("items") if isinstance(data, dict) else None
             
-            if not isinstance(services, list):
-                self.log_result("My Services - Get", False, error="Expected list of services")
+            if not isinstance(services, list) or "next_cursor" not in data:
+                self.log_result("My Services - Get", False, error="Expected paginated list of services")
                 return False
             
             # Should have at least one service from our test
@@ -426,6 +428,20 @@ class HostingInTester:
             
             self.log_result("My Services - Renew", True, f"Service renewed, new expiry: {renew_data['expires_at']}")
             
+            # Dashboard totals cover every order, not just the first page
+            response = self.session.get(f"{BASE_URL}/orders/summary")
+            
+            if response.status_code != 200:
+                self.log_result("Orders Summary", False, error=f"Status: {response.status_code}, Response: {response.text}")
+                return False
+            
+            summary = response.json()
+            if summary.get("total_orders", 0) < len(services) or sum(summary["orders_by_status"].values()) != summary["total_orders"]:
+                self.log_result("Orders Summary", False, error=f"Inconsistent summary: {summary}")
+                return False
+            
+            self.log_result("Orders Summary", True, f"{summary['total_orders']} orders, payments: {summary['payments_by_status']}")
+            
             return True
             
         except Exception as e:
@@ -527,7 +543,42 @@ class HostingInTester:
                 self.log_result("Edge Case - Non-existent Payment", True, "Non-existent payment correctly returns 404")
             else:
                 self.log_result("Edge Case - Non-existent Payment", False, error=f"Expected 404, got {response.status_code}")
+
+            # Tampered admin activity cursors are rejected, not a server error
+            admin_session = requests.Session()
+            response = admin_session.post(f"{BASE_URL}/auth/login", data={
+                "username": ADMIN_USER["email"],
+                "password": ADMIN_USER["password"]
+            })
+            if response.status_code != 200:
+                self.log_result("Edge Case - Malformed Activity Cursor", False, error=f"Admin login failed: {response.status_code}")
+                return False
+            
+            admin = response.json()
+            admin_session.headers.update({"Authorization": f"Bearer {admin['access_token']}"})
+            activity_url = f"{BASE_URL}/admin/users/{admin['user']['id']}/activity"
+            timestamp = datetime.now().isoformat()
+            bad_cursors = {
+                "bad id": {"f": "activity", "id": "order:not-an-object-id", "dt": timestamp},
+                "unknown source": {"f": "activity", "id": f"payment:{'0' * 24}", "dt": timestamp},
+                "missing separator": {"f": "activity", "id": "0" * 24, "dt": timestamp}
+            }
+            for label, payload in bad_cursors.items():
+                raw = json.dumps(payload, separators=(",", ":")).encode()
+                cursor = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+                response = admin_session.get(activity_url, params={"cursor": cursor})
+                if response.status_code != 400:
+                    self.log_result("Edge Case - Malformed Activity Cursor", False, error=f"{label}: expected 400, got {response.status_code}")
+                    return False
+            
+                # The same cursor cut short no longer decodes at all
+                response = admin_session.get(activity_url, params={"cursor": cursor[:len(cursor) // 2]})
+                if response.status_code != 400:
+                    self.log_result("Edge Case - Malformed Activity Cursor", False, error=f"{label} (truncated): expected 400, got {response.status_code}")
+                    return False
             
+            self.log_result("Edge Case - Malformed Activity Cursor", True, "Malformed activity cursors correctly return 400")
+
             return True
             
         except Exception as e:
@@ -236,12 +236,14 @@ class DashboardTester:
             response = self.session.get(f"{BASE_URL}/history/timeline")
             
             if response.status_code == 200:
-                timeline = response.json()
+                data = response.json()
                 
-                if not isinstance(timeline, list):
-                    self.log_result("Activity Timeline API", False, error="Response is not a list")
+                if not isinstance(data, dict) or not isinstance(data.get("items"), list) or "next_cursor" not in data:
+                    self.log_result("Activity Timeline API", False, error="Response is not a {items, next_cursor} page")
                     return False
                 
+                timeline = data["items"]
+                
                 if len(timeline) == 0:
                     self.log_result("Activity Timeline API", False, error="No timeline events found")
                     return False
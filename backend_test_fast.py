@@ -335,10 +335,11 @@ class HostingInTester:
                 self.log_result("My Services", False, error=f"Get services failed: {response.status_code}")
                 return False
             
-            services = response.json()
+            data = response.json()
+            services = data.get("items") if isinstance(data, dict) else None
             
-            if not isinstance(services, list):
-                self.log_result("My Services", False, error="Services response not a list")
+            if not isinstance(services, list) or "next_cursor" not in data:
+                self.log_result("My Services", False, error="Services response not a paginated list")
                 return False
             
             if len(services) == 0:
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Query Count Regression Test - HostingIn API
+Listing endpoints must issue a constant number of MongoDB commands no matter
+how many orders a user has (no N+1 package lookups).
+
+Requires the backend to run with DB_QUERY_COUNT_HEADER=true so every
+response carries an X-DB-Query-Count header.
+"""
+
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime
+
+# Configuration
+BASE_URL = os.environ.get("TEST_BASE_URL", "http://localhost:8001/api")
+ENDPOINTS = ["/orders", "/services/my"]
+
+
+class QueryCountTester:
+    def __init__(self):
+        self.session = requests.Session()
+        self.test_results = []
+        self.package_id = None
+
+    def log_result(self, test_name, success, details="", error=""):
+        """Log test result"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        self.test_results.append({
+            "test": test_name,
+            "status": status,
+            "details": details,
+            "error": error,
+            "timestamp": datetime.now().isoformat()
+        })
+        print(f"{status} {test_name}")
+        if details:
+            print(f"   Details: {details}")
+        if error:
+            print(f"   Error: {error}")
+        print()
+
+    def register_user(self):
+        """Register a fresh user so the order count is fully controlled"""
+        email = f"querycount-{uuid.uuid4().hex[:8]}@hostingin.test"
+        response = self.session.post(f"{BASE_URL}/auth/register", json={
+            "name": "Query Count User",
+            "email": email,
+            "password": "password123"
+        })
+        if response.status_code != 200:
+            self.log_result("Register User", False, error=f"Status: {response.status_code}, Response: {response.text}")
+            return False
+
+        token = response.json()["access_token"]
+        self.session.headers.update({"Authorization": f"Bearer {token}"})
+        self.package_id = self.session.get(f"{BASE_URL}/packages").json()[0]["id"]
+        self.log_result("Register User", True, f"Registered {email}")
+        return True
+
+    def create_orders(self, count):
+        for i in range(count):
+            response = self.session.post(f"{BASE_URL}/orders", json={
+                "package_id": self.package_id,
+                "domain": f"qc-{uuid.uuid4().hex[:6]}-{i}.com",
+                "period_months": 1
+            })
+            if response.status_code != 200:
+                return False
+        return True
+
+    def query_counts(self):
+        counts = {}
+        for endpoint in ENDPOINTS:
+            # Warm the auth cache so only the endpoint's own queries are counted
+            self.session.get(f"{BASE_URL}{endpoint}")
+            response = self.session.get(f"{BASE_URL}{endpoint}")
+            header = response.headers.get("X-DB-Query-Count")
+            if header is None:
+                return None
+            counts[endpoint] = int(header)
+        return counts
+
+    def test_constant_query_count(self):
+        """1 order vs 500 orders must cost the same number of queries"""
+        if not self.create_orders(1):
+            self.log_result("Constant Query Count", False, error="Failed to create first order")
+            return False
+
+        small = self.query_counts()
+        if small is None:
+            self.log_result("Constant Query Count", False, error="X-DB-Query-Count header missing (set DB_QUERY_COUNT_HEADER=true)")
+            return False
+
+        if not self.create_orders(499):
+            self.log_result("Constant Query Count", False, error="Failed to create orders")
+            return False
+
+        large = self.query_counts()
+        mismatches = [f"{e}: {small[e]} -> {large[e]}" for e in ENDPOINTS if small[e] != large[e]]
+        if mismatches:
+            self.log_result("Constant Query Count", False, error="; ".join(mismatches))
+            return False
+
+        self.log_result("Constant Query Count", True, ", ".join(f"{e}: {large[e]} queries" for e in ENDPOINTS))
+        return True
+
+    def run_all_tests(self):
+        print("=" * 80)
+        print("QUERY COUNT REGRESSION TEST")
+        print("=" * 80)
+        print()
+        return self.register_user() and self.test_constant_query_count()
+
+
+if __name__ == "__main__":
+    tester = QueryCountTester()
+    success = tester.run_all_tests()
+    sys.exit(0 if success else 1)
@@ -4,6 +4,7 @@ import { Bell, X, Check, CheckCheck, ExternalLink } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { toast } from 'sonner';
+import { openEventStream } from '../utils/eventStream';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
@@ -34,11 +35,34 @@ const NotificationDropdown = () => {
     }
   };
   
-  // Poll for new notifications every 15 seconds
+  // Load once, then receive new notifications over a server-sent event stream
   useEffect(() => {
-    fetchNotifications();
-    const interval = setInterval(fetchNotifications, 15000);
-    return () => clearInterval(interval);
+    const token = localStorage.getItem('token');
+    return openEventStream('/notifications/events', token, (source) => {
+      source.addEventListener('unread_count', (event) => {
+        setUnreadCount(JSON.parse(event.data).count);
+      });
+
+      source.addEventListener('notification', (event) => {
+        const { notification } = JSON.parse(event.data);
+        setNotifications(prev => [notification, ...prev].slice(0, 5));
+        setUnreadCount(prev => prev + 1);
+      });
+
+      source.addEventListener('read', (event) => {
+        const { ids } = JSON.parse(event.data);
+        setNotifications(prev =>
+          prev.map(n => (ids === null || ids.includes(n.id)) ? { ...n, is_read: true } : n)
+        );
+      });
+
+      // Fires on the first connect and on every automatic reconnect, so this
+      // both loads the list and resyncs whatever was missed meanwhile
+      source.onopen = () => fetchNotifications();
+      source.onerror = (error) => {
+        console.error('Notification stream error:', error);
+      };
+    });
   }, []);
   
   // Mark notification as read
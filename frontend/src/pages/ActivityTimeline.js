@@ -10,6 +10,8 @@ const ActivityTimeline = () => {
   const [timeline, setTimeline] = useState([]);
   const [filteredTimeline, setFilteredTimeline] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [activeFilter, setActiveFilter] = useState('all');
   const [searchQuery, setSearchQuery] = useState('');
   
@@ -21,13 +23,15 @@ const ActivityTimeline = () => {
     filterTimeline();
   }, [timeline, activeFilter, searchQuery]);
   
-  const fetchTimeline = async () => {
+  const fetchTimeline = async (cursor = null) => {
     try {
       const token = localStorage.getItem('token');
       const response = await axios.get(`${BACKEND_URL}/api/history/timeline`, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}` },
+        params: cursor ? { cursor } : {}
       });
-      setTimeline(response.data);
+      setTimeline(prev => (cursor ? [...prev, ...response.data.items] : response.data.items));
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Failed to fetch timeline:', error);
       toast.error('Failed to load activity timeline');
@@ -36,6 +40,12 @@ const ActivityTimeline = () => {
     }
   };
   
+  const loadMoreTimeline = async () => {
+    setLoadingMore(true);
+    await fetchTimeline(nextCursor);
+    setLoadingMore(false);
+  };
+  
   const filterTimeline = () => {
     let filtered = [...timeline];
     
@@ -59,8 +69,12 @@ const ActivityTimeline = () => {
     const colors = {
       order_created: 'bg-blue-100 text-blue-700 dark:bg-blue-900/30 dark:text-blue-400',
       payment_success: 'bg-green-100 text-green-700 dark:bg-green-900/30 dark:text-green-400',
+      payment_failed: 'bg-red-100 text-red-700 dark:bg-red-900/30 dark:text-red-400',
       service_active: 'bg-purple-100 text-purple-700 dark:bg-purple-900/30 dark:text-purple-400',
-      support_ticket: 'bg-orange-100 text-orange-700 dark:bg-orange-900/30 dark:text-orange-400'
+      service_renewed: 'bg-purple-100 text-purple-700 dark:bg-purple-900/30 dark:text-purple-400',
+      support_ticket: 'bg-orange-100 text-orange-700 dark:bg-orange-900/30 dark:text-orange-400',
+      ticket_reply: 'bg-orange-100 text-orange-700 dark:bg-orange-900/30 dark:text-orange-400',
+      referral_conversion: 'bg-pink-100 text-pink-700 dark:bg-pink-900/30 dark:text-pink-400'
     };
     return colors[type] || 'bg-gray-100 text-gray-700 dark:bg-gray-900/30 dark:text-gray-400';
   };
@@ -69,8 +83,11 @@ const ActivityTimeline = () => {
     const icons = {
       order_created: Package,
       payment_success: CreditCard,
+      payment_failed: CreditCard,
       service_active: Globe,
-      support_ticket: MessageCircle
+      service_renewed: Globe,
+      support_ticket: MessageCircle,
+      ticket_reply: MessageCircle
     };
     const Icon = icons[type] || History;
     return Icon;
@@ -229,6 +246,18 @@ const ActivityTimeline = () => {
           </div>
         </div>
       )}
+      
+      {!isLoading && nextCursor && (
+        <div className="flex justify-center">
+          <button
+            onClick={loadMoreTimeline}
+            disabled={loadingMore}
+            className="px-4 py-2 rounded-lg border dark:border-gray-700 text-gray-700 dark:text-gray-300 hover:bg-gray-100 dark:hover:bg-gray-800 transition disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
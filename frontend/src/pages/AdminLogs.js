@@ -5,6 +5,7 @@ import {
   CheckCircle, Clock, AlertCircle
 } from 'lucide-react';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
+import { Button } from '../components/ui/button';
 import { Badge } from '../components/ui/badge';
 import { useApi } from '../hooks/useApi';
 import { formatDate } from '../utils/formatters';
@@ -14,15 +15,17 @@ import { toast } from 'sonner';
 export default function AdminLogs() {
   const [logs, setLogs] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const { request } = useApi();
 
   useEffect(() => {
     fetchLogs();
   }, []);
 
-  const fetchLogs = async () => {
+  const fetchLogs = async (cursor = null) => {
     try {
-      const data = await request('GET', '/admin/logs').catch(() => [
+      const data = await request('GET', cursor ? `/admin/logs?cursor=${cursor}` : '/admin/logs').catch(() => ({ items: [
         {
           id: '1',
           admin_user_email: 'admin@hostingin.com',
@@ -44,8 +47,9 @@ export default function AdminLogs() {
           created_at: new Date(Date.now() - 7200000).toISOString(),
           meta: { user_email: 'john@example.com', new_role: 'admin' }
         }
-      ]);
-      setLogs(data);
+      ] }));
+      setLogs(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       toast.error('Failed to fetch activity logs');
     } finally {
@@ -53,6 +57,12 @@ export default function AdminLogs() {
     }
   };
 
+  const loadMoreLogs = async () => {
+    setLoadingMore(true);
+    await fetchLogs(nextCursor);
+    setLoadingMore(false);
+  };
+
   const getActionIcon = (action) => {
     if (action.includes('Update') || action.includes('Changed')) {
       return <Edit className="w-5 h-5 text-blue-600" />;
@@ -254,6 +264,14 @@ export default function AdminLogs() {
                       </motion.div>
                     ))}
                   </div>
+
+                  {nextCursor && (
+                    <div className="flex justify-center mt-6">
+                      <Button variant="outline" onClick={loadMoreLogs} disabled={loadingMore}>
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                      </Button>
+                    </div>
+                  )}
                 </div>
               )}
             </CardContent>
@@ -27,6 +27,8 @@ export default function AdminOrders() {
   const [selectedOrder, setSelectedOrder] = useState(null);
   const [editDialogOpen, setEditDialogOpen] = useState(false);
   const [newStatus, setNewStatus] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const { request } = useApi();
 
   useEffect(() => {
@@ -37,10 +39,11 @@ export default function AdminOrders() {
     filterOrders();
   }, [searchTerm, statusFilter, orders]);
 
-  const fetchOrders = async () => {
+  const fetchOrders = async (cursor = null) => {
     try {
-      const data = await request('GET', '/admin/orders');
-      setOrders(data);
+      const data = await request('GET', cursor ? `/admin/orders?cursor=${cursor}` : '/admin/orders');
+      setOrders(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       toast.error('Failed to fetch orders');
     } finally {
@@ -48,6 +51,12 @@ export default function AdminOrders() {
     }
   };
 
+  const loadMoreOrders = async () => {
+    setLoadingMore(true);
+    await fetchOrders(nextCursor);
+    setLoadingMore(false);
+  };
+
   const filterOrders = () => {
     let filtered = orders;
 
@@ -229,6 +238,13 @@ export default function AdminOrders() {
                       ))}
                     </TableBody>
                   </Table>
+                  {nextCursor && (
+                    <div className="flex justify-center pt-4">
+                      <Button variant="outline" onClick={loadMoreOrders} disabled={loadingMore}>
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                      </Button>
+                    </div>
+                  )}
                 </div>
               )}
             </CardContent>
@@ -15,23 +15,32 @@ const AdminSupport = () => {
   const [activeFilter, setActiveFilter] = useState('all');
   const [replyText, setReplyText] = useState('');
   const [isSubmitting, setIsSubmitting] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   useEffect(() => {
     fetchTickets();
     fetchStats();
   }, [activeFilter]);
   
-  const fetchTickets = async () => {
+  const fetchTickets = async (cursor = null) => {
     try {
       const token = localStorage.getItem('token');
-      const url = activeFilter === 'all' 
-        ? `${BACKEND_URL}/api/admin/support/tickets`
-        : `${BACKEND_URL}/api/admin/support/tickets?status=${activeFilter}`;
+      // The cursor only resumes the listing it came from, so keep the filter with it
+      const params = {};
+      if (activeFilter !== 'all') {
+        params.status = activeFilter;
+      }
+      if (cursor) {
+        params.cursor = cursor;
+      }
         
-      const response = await axios.get(url, {
-        headers: { Authorization: `Bearer ${token}` }
+      const response = await axios.get(`${BACKEND_URL}/api/admin/support/tickets`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params
       });
-      setTickets(response.data);
+      setTickets(prev => (cursor ? [...prev, ...response.data.items] : response.data.items));
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Failed to fetch tickets:', error);
       toast.error('Failed to load tickets');
@@ -40,6 +49,12 @@ const AdminSupport = () => {
     }
   };
   
+  const loadMoreTickets = async () => {
+    setLoadingMore(true);
+    await fetchTickets(nextCursor);
+    setLoadingMore(false);
+  };
+  
   const fetchStats = async () => {
     try {
       const token = localStorage.getItem('token');
@@ -254,6 +269,16 @@ const AdminSupport = () => {
                 );
               })
             )}
+            
+            {!isLoading && nextCursor && (
+              <button
+                onClick={loadMoreTickets}
+                disabled={loadingMore}
+                className="w-full px-4 py-2 rounded-lg border dark:border-gray-700 text-gray-700 dark:text-gray-300 hover:bg-gray-100 dark:hover:bg-gray-800 transition disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            )}
           </div>
           
           {/* Ticket Detail */}
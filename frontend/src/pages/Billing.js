@@ -17,16 +17,26 @@ export default function Billing() {
   const [orders, setOrders] = useState([]);
   const [payments, setPayments] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const { request } = useApi();
 
   useEffect(() => {
     fetchData();
   }, []);
 
-  const fetchData = async () => {
+  const fetchData = async (cursor = null) => {
     try {
-      const ordersData = await request('GET', '/orders');
-      setOrders(ordersData);
+      const [{ items: ordersData, next_cursor }, summaryData] = await Promise.all([
+        request('GET', cursor ? `/orders?cursor=${cursor}` : '/orders'),
+        cursor ? Promise.resolve(null) : request('GET', '/orders/summary')
+      ]);
+      setOrders(prev => (cursor ? [...prev, ...ordersData] : ordersData));
+      setNextCursor(next_cursor);
+      if (summaryData) {
+        setSummary(summaryData);
+      }
       
       // Get all payments from orders
       const allPayments = [];
@@ -44,7 +54,7 @@ export default function Billing() {
           console.error('Error fetching payments for order:', order.id);
         }
       }
-      setPayments(allPayments);
+      setPayments(prev => (cursor ? [...prev, ...allPayments] : allPayments));
     } catch (error) {
       toast.error('Failed to fetch billing data');
     } finally {
@@ -100,11 +110,20 @@ export default function Billing() {
     toast.success('Receipt downloaded!');
   };
 
-  const totalSpent = orders.reduce((sum, order) => 
-    order.status !== 'cancelled' ? sum + order.price_cents : sum, 0
+  const loadMorePayments = async () => {
+    setLoadingMore(true);
+    await fetchData(nextCursor);
+    setLoadingMore(false);
+  };
+
+  // Totals cover every order, not just the pages loaded so far
+  const totalSpent = Object.entries(summary?.spent_cents_by_status || {}).reduce(
+    (sum, [status, cents]) => (status !== 'cancelled' ? sum + cents : sum), 0
   );
-  const successfulPayments = payments.filter(p => p.status === 'success').length;
-  const pendingPayments = payments.filter(p => p.status === 'pending').length;
+  const paymentsByStatus = summary?.payments_by_status || {};
+  const totalPayments = Object.values(paymentsByStatus).reduce((sum, count) => sum + count, 0);
+  const successfulPayments = paymentsByStatus.success || 0;
+  const pendingPayments = paymentsByStatus.pending || 0;
 
   const stats = [
     {
@@ -116,7 +135,7 @@ export default function Billing() {
     },
     {
       title: 'Total Payments',
-      value: payments.length,
+      value: totalPayments,
       icon: Receipt,
       color: 'from-blue-500 to-cyan-500',
       bgColor: 'bg-blue-100 dark:bg-blue-900/20'
@@ -218,7 +237,7 @@ export default function Billing() {
                     </div>
                   ))}
                 </div>
-              ) : payments.length === 0 ? (
+              ) : payments.length === 0 && !nextCursor ? (
                 <div className="text-center py-12">
                   <CreditCard className="w-16 h-16 mx-auto mb-4 text-slate-400" />
                   <h3 className="text-xl font-semibold mb-2">No payments yet</h3>
@@ -270,6 +289,13 @@ export default function Billing() {
                       )}
                     </motion.div>
                   ))}
+                  {nextCursor && (
+                    <div className="flex justify-center pt-4">
+                      <Button variant="outline" onClick={loadMorePayments} disabled={loadingMore}>
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                      </Button>
+                    </div>
+                  )}
                 </div>
               )}
             </CardContent>
@@ -294,7 +320,7 @@ export default function Billing() {
                       {formatCurrency(totalSpent)}
                     </h3>
                     <p className="text-sm text-slate-600 dark:text-slate-400 mt-1">
-                      Across {orders.length} order(s)
+                      Across {summary?.total_orders || 0} order(s)
                     </p>
                   </div>
                   <TrendingUp className="w-12 h-12 text-violet-600" />
@@ -16,6 +16,7 @@ import { toast } from 'sonner';
 
 export default function Dashboard() {
   const [orders, setOrders] = useState([]);
+  const [summary, setSummary] = useState(null);
   const [packages, setPackages] = useState([]);
   const [loading, setLoading] = useState(true);
   const { request } = useApi();
@@ -49,11 +50,14 @@ export default function Dashboard() {
 
   const fetchData = async () => {
     try {
-      const [ordersData, packagesData] = await Promise.all([
-        request('GET', '/orders'),
+      // The cards need totals over every order; the list only the latest few
+      const [ordersData, summaryData, packagesData] = await Promise.all([
+        request('GET', '/orders?limit=5'),
+        request('GET', '/orders/summary'),
         request('GET', '/packages')
       ]);
-      setOrders(ordersData);
+      setOrders(ordersData.items);
+      setSummary(summaryData);
       setPackages(packagesData);
     } catch (error) {
       toast.error('Failed to fetch dashboard data');
@@ -62,31 +66,34 @@ export default function Dashboard() {
     }
   };
 
+  const ordersByStatus = summary?.orders_by_status || {};
+  const totalSpent = Object.values(summary?.spent_cents_by_status || {}).reduce((sum, cents) => sum + cents, 0);
+
   const stats = [
     {
       title: 'Total Services',
-      value: orders.length,
+      value: summary?.total_orders || 0,
       icon: Server,
       color: 'from-blue-500 to-cyan-500',
       bgColor: 'bg-blue-100 dark:bg-blue-900/20'
     },
     {
       title: 'Active Plans',
-      value: orders.filter(o => o.status === 'paid' || o.status === 'active').length,
+      value: (ordersByStatus.paid || 0) + (ordersByStatus.active || 0),
       icon: ShoppingCart,
       color: 'from-violet-500 to-purple-500',
       bgColor: 'bg-violet-100 dark:bg-violet-900/20'
     },
     {
       title: 'Pending Payments',
-      value: orders.filter(o => o.status === 'pending').length,
+      value: ordersByStatus.pending || 0,
       icon: Clock,
       color: 'from-amber-500 to-orange-500',
       bgColor: 'bg-amber-100 dark:bg-amber-900/20'
     },
     {
       title: 'Total Spent',
-      value: formatCurrency(orders.reduce((sum, o) => sum + o.price_cents, 0)),
+      value: formatCurrency(totalSpent),
       icon: CreditCard,
       color: 'from-green-500 to-emerald-500',
       bgColor: 'bg-green-100 dark:bg-green-900/20'
@@ -16,16 +16,19 @@ import { toast } from 'sonner';
 export default function MyServices() {
   const [services, setServices] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const { request } = useApi();
 
   useEffect(() => {
     fetchServices();
   }, []);
 
-  const fetchServices = async () => {
+  const fetchServices = async (cursor = null) => {
     try {
-      const data = await request('GET', '/services/my');
-      setServices(data);
+      const data = await request('GET', cursor ? `/services/my?cursor=${cursor}` : '/services/my');
+      setServices(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       toast.error('Failed to load services');
     } finally {
@@ -33,6 +36,12 @@ export default function MyServices() {
     }
   };
 
+  const loadMoreServices = async () => {
+    setLoadingMore(true);
+    await fetchServices(nextCursor);
+    setLoadingMore(false);
+  };
+
   const renewService = async (serviceId) => {
     try {
       await request('POST', `/services/${serviceId}/renew`);
@@ -127,7 +136,7 @@ export default function MyServices() {
           </div>
           
           <Badge variant="secondary" className="text-lg px-4 py-2">
-            {services.length} {services.length === 1 ? 'Service' : 'Services'}
+            {services.length}{nextCursor ? '+' : ''} {services.length === 1 && !nextCursor ? 'Service' : 'Services'}
           </Badge>
         </motion.div>
 
@@ -280,6 +289,14 @@ export default function MyServices() {
             })}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="flex justify-center">
+            <Button variant="outline" onClick={loadMoreServices} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </Button>
+          </div>
+        )}
       </div>
     </DashboardLayout>
   );
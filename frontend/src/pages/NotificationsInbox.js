@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { motion } from 'framer-motion';
 import { Bell, Filter, Trash2, CheckCheck, Search } from 'lucide-react';
 import axios from 'axios';
@@ -12,9 +12,15 @@ const NotificationsInbox = () => {
   const [isLoading, setIsLoading] = useState(true);
   const [activeFilter, setActiveFilter] = useState('all');
   const [searchQuery, setSearchQuery] = useState('');
+  const pendingReadIds = useRef(new Set());
+  const flushTimer = useRef(null);
   
   useEffect(() => {
     fetchNotifications();
+    return () => {
+      clearTimeout(flushTimer.current);
+      flushReads();
+    };
   }, []);
   
   useEffect(() => {
@@ -55,23 +61,34 @@ const NotificationsInbox = () => {
     setFilteredNotifications(filtered);
   };
   
-  const markAsRead = async (notificationId) => {
+  // Send queued reads in one request
+  const flushReads = async () => {
+    const ids = Array.from(pendingReadIds.current);
+    pendingReadIds.current.clear();
+    if (ids.length === 0) return;
+    
     try {
       const token = localStorage.getItem('token');
-      await axios.patch(
-        `${BACKEND_URL}/api/notifications/${notificationId}/read`,
-        {},
+      await axios.post(
+        `${BACKEND_URL}/api/notifications/read`,
+        { ids },
         { headers: { Authorization: `Bearer ${token}` } }
       );
-      
-      setNotifications(prev =>
-        prev.map(n => n.id === notificationId ? { ...n, is_read: true } : n)
-      );
     } catch (error) {
       console.error('Failed to mark as read:', error);
     }
   };
   
+  // Mark read locally right away and batch the server update
+  const markAsRead = (notificationId) => {
+    setNotifications(prev =>
+      prev.map(n => n.id === notificationId ? { ...n, is_read: true } : n)
+    );
+    pendingReadIds.current.add(notificationId);
+    clearTimeout(flushTimer.current);
+    flushTimer.current = setTimeout(flushReads, 1000);
+  };
+  
   const markAllAsRead = async () => {
     try {
       const token = localStorage.getItem('token');
@@ -25,6 +25,8 @@ export default function Orders() {
   const [searchTerm, setSearchTerm] = useState('');
   const [statusFilter, setStatusFilter] = useState('all');
   const [currentPage, setCurrentPage] = useState(1);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const itemsPerPage = 10;
   const { request } = useApi();
 
@@ -36,10 +38,15 @@ export default function Orders() {
     filterOrders();
   }, [searchTerm, statusFilter, orders]);
 
-  const fetchOrders = async () => {
+  useEffect(() => {
+    setCurrentPage(1);
+  }, [searchTerm, statusFilter]);
+
+  const fetchOrders = async (cursor = null) => {
     try {
-      const data = await request('GET', '/orders');
-      setOrders(data);
+      const data = await request('GET', cursor ? `/orders?cursor=${cursor}` : '/orders');
+      setOrders(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       toast.error('Failed to fetch orders');
     } finally {
@@ -47,6 +54,12 @@ export default function Orders() {
     }
   };
 
+  const loadMoreOrders = async () => {
+    setLoadingMore(true);
+    await fetchOrders(nextCursor);
+    setLoadingMore(false);
+  };
+
   const filterOrders = () => {
     let filtered = orders;
 
@@ -62,7 +75,6 @@ export default function Orders() {
     }
 
     setFilteredOrders(filtered);
-    setCurrentPage(1);
   };
 
   const viewOrderDetail = async (orderId) => {
@@ -342,6 +354,14 @@ export default function Orders() {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="flex justify-center">
+            <Button variant="outline" onClick={loadMoreOrders} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </Button>
+          </div>
+        )}
       </div>
 
       {/* Order Detail Modal */}
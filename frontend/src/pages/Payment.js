@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { motion } from 'framer-motion';
 import { useNavigate, useLocation } from 'react-router-dom';
 import { 
@@ -10,7 +10,9 @@ import { Button } from '../components/ui/button';
 import { Badge } from '../components/ui/badge';
 import { Alert, AlertDescription } from '../components/ui/alert';
 import { useApi } from '../hooks/useApi';
+import { useAuth } from '../contexts/AuthContext';
 import { formatCurrency } from '../utils/formatters';
+import { openEventStream } from '../utils/eventStream';
 import DashboardLayout from '../components/DashboardLayout';
 import { toast } from 'sonner';
 
@@ -18,6 +20,7 @@ export default function Payment() {
   const location = useLocation();
   const navigate = useNavigate();
   const { request } = useApi();
+  const { token } = useAuth();
   
   const paymentData = location.state;
   
@@ -26,6 +29,7 @@ export default function Payment() {
   const [timeRemaining, setTimeRemaining] = useState(900); // 15 minutes in seconds
   const [elapsedTime, setElapsedTime] = useState(0);
   const [checking, setChecking] = useState(false);
+  const stopStreamRef = useRef(null);
 
   useEffect(() => {
     if (!paymentData || !paymentData.paymentId) {
@@ -36,48 +40,64 @@ export default function Payment() {
 
     // Start payment simulation
     startPaymentSimulation();
+    return () => stopStreamRef.current?.();
   }, []);
 
   const startPaymentSimulation = async () => {
     try {
       await request('POST', `/payment/${paymentData.paymentId}/simulate`);
-      // Start polling for status
-      startStatusPolling();
+      // Wait for status changes pushed by the server
+      stopStreamRef.current = startStatusStream();
     } catch (error) {
       toast.error('Failed to start payment process');
     }
   };
 
-  const startStatusPolling = useCallback(() => {
-    const pollInterval = setInterval(async () => {
-      try {
-        const status = await request('GET', `/payment/${paymentData.paymentId}/status`);
-        
-        setPaymentStatus(status.payment_status);
-        setOrderStatus(status.order_status);
-        setElapsedTime(status.elapsed_seconds);
-        setTimeRemaining(status.expires_in_seconds);
+  const applyStatus = useCallback((status) => {
+    setPaymentStatus(status.payment_status);
+    setOrderStatus(status.order_status);
+    setElapsedTime(status.elapsed_seconds);
+    setTimeRemaining(status.expires_in_seconds);
 
-        // Stop polling if payment is complete or failed
+    if (status.payment_status === 'success') {
+      toast.success('Payment successful! Redirecting...');
+      setTimeout(() => {
+        navigate('/dashboard/services');
+      }, 2000);
+    } else if (status.payment_status === 'failed') {
+      toast.error('Payment failed or cancelled');
+    }
+  }, [navigate]);
+
+  const startStatusStream = useCallback(() => {
+    // Count the timers down locally between server events
+    const tick = setInterval(() => {
+      setElapsedTime(prev => prev + 1);
+      setTimeRemaining(prev => Math.max(0, prev - 1));
+    }, 1000);
+
+    let closeStream = null;
+    const stop = () => {
+      clearInterval(tick);
+      if (closeStream) closeStream();
+    };
+
+    closeStream = openEventStream(`/payment/${paymentData.paymentId}/events`, token, (source) => {
+      source.addEventListener('status', (event) => {
+        const status = JSON.parse(event.data);
+        applyStatus(status);
         if (status.payment_status === 'success' || status.payment_status === 'failed') {
-          clearInterval(pollInterval);
-          
-          if (status.payment_status === 'success') {
-            toast.success('Payment successful! Redirecting...');
-            setTimeout(() => {
-              navigate('/dashboard/services');
-            }, 2000);
-          } else {
-            toast.error('Payment failed or cancelled');
-          }
+          stop();
         }
-      } catch (error) {
-        console.error('Failed to check payment status:', error);
-      }
-    }, 3000); // Poll every 3 seconds
+      });
+
+      source.onerror = (error) => {
+        console.error('Payment status stream error:', error);
+      };
+    });
 
-    return () => clearInterval(pollInterval);
-  }, [paymentData?.paymentId, request, navigate]);
+    return stop;
+  }, [paymentData?.paymentId, token, applyStatus]);
 
   const formatTime = (seconds) => {
     const mins = Math.floor(seconds / 60);
@@ -19,6 +19,9 @@ import { toast } from 'sonner';
 export default function Tickets() {
   const [tickets, setTickets] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [createDialogOpen, setCreateDialogOpen] = useState(false);
   const [detailDialogOpen, setDetailDialogOpen] = useState(false);
   const [selectedTicket, setSelectedTicket] = useState(null);
@@ -35,10 +38,17 @@ export default function Tickets() {
     fetchTickets();
   }, []);
 
-  const fetchTickets = async () => {
+  const fetchTickets = async (cursor = null) => {
     try {
-      const data = await request('GET', '/tickets');
-      setTickets(data);
+      const [data, summaryData] = await Promise.all([
+        request('GET', cursor ? `/tickets?cursor=${cursor}` : '/tickets'),
+        cursor ? Promise.resolve(null) : request('GET', '/tickets/summary')
+      ]);
+      setTickets(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
+      if (summaryData) {
+        setSummary(summaryData);
+      }
     } catch (error) {
       toast.error('Failed to fetch tickets');
     } finally {
@@ -46,6 +56,12 @@ export default function Tickets() {
     }
   };
 
+  const loadMoreTickets = async () => {
+    setLoadingMore(true);
+    await fetchTickets(nextCursor);
+    setLoadingMore(false);
+  };
+
   const handleCreateTicket = async () => {
     if (!newTicket.subject.trim() || !newTicket.message.trim()) {
       toast.error('Please fill in all fields');
@@ -87,13 +103,14 @@ export default function Tickets() {
     ticket.message.toLowerCase().includes(searchTerm.toLowerCase())
   );
 
-  const openTickets = tickets.filter(t => t.status === 'open').length;
-  const resolvedTickets = tickets.filter(t => t.status === 'resolved').length;
+  // Counted over every ticket, not just the pages loaded so far
+  const openTickets = summary?.by_status.open || 0;
+  const resolvedTickets = summary?.by_status.resolved || 0;
 
   const stats = [
     {
       title: 'Total Tickets',
-      value: tickets.length,
+      value: summary?.total || 0,
       icon: MessageSquare,
       color: 'from-blue-500 to-cyan-500',
       bgColor: 'bg-blue-100 dark:bg-blue-900/20'
@@ -281,6 +298,14 @@ export default function Tickets() {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="flex justify-center">
+            <Button variant="outline" onClick={loadMoreTickets} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </Button>
+          </div>
+        )}
       </div>
 
       {/* Create Ticket Dialog */}
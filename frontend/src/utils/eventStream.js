@@ -0,0 +1,42 @@
+import axios from 'axios';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
+const API = `${BACKEND_URL}/api`;
+
+// EventSource cannot send an Authorization header, so each connection uses a
+// short-lived stream token in the query string instead of the session token.
+// The browser's own reconnects reuse the URL; once that token has expired the
+// server rejects it, the source closes, and we reconnect with a fresh one.
+export const openEventStream = (path, sessionToken, setup, retryMs = 3000) => {
+  let source = null;
+  let retry = null;
+  let stopped = false;
+
+  const connect = async () => {
+    try {
+      const { data } = await axios.post(`${API}/auth/stream-token`, null, {
+        headers: { Authorization: `Bearer ${sessionToken}` }
+      });
+      if (stopped) return;
+      source = new EventSource(`${API}${path}?access_token=${encodeURIComponent(data.token)}`);
+      setup(source);
+      source.addEventListener('error', () => {
+        if (!stopped && source.readyState === EventSource.CLOSED) {
+          retry = setTimeout(connect, retryMs);
+        }
+      });
+    } catch (error) {
+      console.error('Failed to open event stream:', error);
+      // A rejected session will not recover by retrying
+      if (!stopped && error.response?.status !== 401) retry = setTimeout(connect, retryMs);
+    }
+  };
+
+  connect();
+
+  return () => {
+    stopped = true;
+    clearTimeout(retry);
+    if (source) source.close();
+  };
+};
@@ -5,9 +5,13 @@ Quick test for payment status endpoint fix
 
 import requests
 import json
+from datetime import datetime, timezone
 
 BASE_URL = "https://nav-restoration.preview.emergentagent.com/api"
 TEST_USER = {"email": "test@hostingin.com", "password": "password123"}
+# Every pending payment is settled or expired by the scheduler within the
+# 15 minute payment timeout (plus a scheduler tick)
+STALE_PENDING_SECONDS = 900 + 60
 
 def test_payment_status():
     session = requests.Session()
@@ -76,5 +80,55 @@ def test_payment_status():
     
     return True
 
+def test_no_stale_pending_payments():
+    """Payments created before the scheduler (no due_at) must still settle"""
+    session = requests.Session()
+    
+    response = session.post(f"{BASE_URL}/auth/login", data={
+        "username": TEST_USER["email"],
+        "password": TEST_USER["password"]
+    })
+    
+    if response.status_code != 200:
+        print(f"❌ Login failed: {response.status_code}")
+        return False
+    
+    token = response.json()["access_token"]
+    session.headers.update({"Authorization": f"Bearer {token}"})
+    
+    # Walk every page: the seeded (pre-scheduler) order is the oldest one
+    orders = []
+    cursor = None
+    while True:
+        response = session.get(f"{BASE_URL}/orders", params={"cursor": cursor} if cursor else {})
+        if response.status_code != 200:
+            print(f"❌ Order list failed: {response.status_code} - {response.text}")
+            return False
+        data = response.json()
+        orders.extend(data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+    
+    now = datetime.now(timezone.utc)
+    for order in orders:
+        response = session.get(f"{BASE_URL}/payments/{order['id']}")
+        if response.status_code != 200:
+            print(f"❌ Payment list failed: {response.status_code} - {response.text}")
+            return False
+        
+        for payment in response.json():
+            created_at = datetime.fromisoformat(payment["created_at"])
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            age = (now - created_at).total_seconds()
+            if payment["status"] == "pending" and age > STALE_PENDING_SECONDS:
+                print(f"❌ Payment {payment['id']} still pending after {age:.0f}s")
+                return False
+    
+    print("✅ No payment is left pending past the payment timeout")
+    return True
+
 if __name__ == "__main__":
-    test_payment_status()
\ No newline at end of file
+    test_payment_status()
+    test_no_stale_pending_payments()
\ No newline at end of file